@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Google Workspace Bulk Email Creator - Offline Benchmark
+Drives GoogleWorkspaceManager end to end against a local stand-in for the
+Directory API, so creation engines can be compared without a real tenant
+"""
+
+import os
+import io
+import json
+import time
+import random
+import socket
+import argparse
+import logging
+import tempfile
+import threading
+import contextlib
+import http.server
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from email import policy
+from email.parser import BytesParser
+from urllib.parse import urlparse, parse_qs, unquote
+from typing import List, Tuple, Optional, Dict
+
+import bot
+
+USERS_PATH = '/admin/directory/v1/users'
+GROUPS_PATH = '/admin/directory/v1/groups'
+BATCH_PATHS = ('/batch', '/batch/admin/directory_v1')
+BENCH_DOMAIN = 'bench.example.com'
+BENCH_PASSWORD = 'Bench123@'
+
+
+def _error(code: int, message: str, reason: str) -> Dict:
+    """Build a Google API style error payload"""
+    return {"error": {"code": code, "message": message,
+                      "errors": [{"message": message, "domain": "global", "reason": reason}]}}
+
+
+def parse_fields(fields: str) -> Dict:
+    """Parse a partial response mask such as 'nextPageToken,users(id,primaryEmail)'"""
+    tree, stack, name = {}, [], ''
+    for char in fields + ',':
+        if char in ',()':
+            if name.strip():
+                tree[name.strip()] = {}
+            if char == '(':
+                stack.append(tree)
+                tree = tree[name.strip()]
+            elif char == ')':
+                tree = stack.pop()
+            name = ''
+        else:
+            name += char
+    return tree
+
+
+def apply_fields(value, mask: Dict):
+    """Keep only the masked fields of a response, like the real API's fields= parameter"""
+    if not mask:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, mask) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], sub) for key, sub in mask.items() if key in value}
+    return value
+
+
+class FakeDirectory:
+    """In-memory Directory API with injectable latency, errors and quota"""
+
+    def __init__(self, latency: float = 0.0, item_latency: float = 0.0, error_rate: float = 0.0,
+                 quota: float = 0.0, retry_after: Optional[float] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.item_latency = item_latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.retry_after = retry_after
+        self.users = {}
+        self.members = defaultdict(set)  # group -> member addresses
+        self.calls = Counter()
+        self.statuses = Counter()
+        self.http_requests = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = quota
+        self._updated = time.monotonic()
+        self._next_id = 100000000000000000000
+
+    def add_user(self, email: str, given_name: str = '', family_name: str = '') -> Dict:
+        """Insert a user directly into the directory state"""
+        with self._lock:
+            self._next_id += 1
+            user = {
+                "kind": "admin#directory#user",
+                "id": str(self._next_id),
+                "primaryEmail": email,
+                "name": {"givenName": given_name, "familyName": family_name},
+                "suspended": False,
+                "creationTime": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            }
+            self.users[email.lower()] = user
+            return user
+
+    def _take_quota(self) -> bool:
+        """Token bucket of `quota` calls per second, unlimited when 0"""
+        if self.quota <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.quota, self._tokens + (now - self._updated) * self.quota)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def handle(self, method: str, target: str, body: bytes) -> Tuple[int, Dict, Dict]:
+        """Serve one API call, returning (status, payload, headers)"""
+        parsed = urlparse(target)
+        path = parsed.path
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        if path == USERS_PATH:
+            name = 'users.list' if method == 'GET' else 'users.insert'
+        elif path.startswith(USERS_PATH + '/'):
+            name = f"users.{method.lower()}"
+        elif path.startswith(GROUPS_PATH + '/') and path.endswith('/members') and method == 'POST':
+            name = 'members.insert'
+        else:
+            name = 'unknown'
+
+        with self._lock:
+            self.calls[name] += 1
+
+        status, payload, headers = self._dispatch(name, method, path, query, body)
+        if status < 300 and payload is not None and query.get('fields'):
+            payload = apply_fields(payload, parse_fields(query['fields']))
+        with self._lock:
+            self.statuses[status] += 1
+        return status, payload, headers
+
+    def _dispatch(self, name: str, method: str, path: str, query: Dict,
+                  body: bytes) -> Tuple[int, Dict, Dict]:
+        if not self._take_quota():
+            headers = {'Retry-After': f"{self.retry_after:g}"} if self.retry_after else {}
+            return 403, _error(403, "Quota exceeded for quota metric 'Queries'", 'quotaExceeded'), headers
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return 503, _error(503, "Backend Error", 'backendError'), {}
+
+        if name == 'users.list':
+            domain = query.get('domain', '').lower()
+            emails = sorted(e for e in self.users if e.endswith('@' + domain))
+            offset = int(query.get('pageToken') or 0)
+            size = int(query.get('maxResults') or 100)
+            page = emails[offset:offset + size]
+            response = {"kind": "admin#directory#users", "users": [self.users[e] for e in page]}
+            if offset + size < len(emails):
+                response["nextPageToken"] = str(offset + size)
+            return 200, response, {}
+
+        if name == 'users.insert':
+            user = json.loads(body or b'{}')
+            email = user.get('primaryEmail', '')
+            if email.lower() in self.users:
+                return 409, _error(409, "Entity already exists.", 'duplicate'), {}
+            name_info = user.get('name', {})
+            created = self.add_user(email, name_info.get('givenName', ''), name_info.get('familyName', ''))
+            created['orgUnitPath'] = user.get('orgUnitPath', '/')
+            return 200, created, {}
+
+        if name == 'members.insert':
+            group = unquote(path[len(GROUPS_PATH) + 1:-len('/members')]).lower()
+            member = json.loads(body or b'{}')
+            email = member.get('email', '').lower()
+            with self._lock:
+                if email in self.members[group]:
+                    return 409, _error(409, "Member already exists.", 'duplicate'), {}
+                self.members[group].add(email)
+            return 200, {"kind": "admin#directory#member", "email": email,
+                         "role": member.get('role', 'MEMBER'), "type": "USER"}, {}
+
+        if name in ('users.get', 'users.delete', 'users.put', 'users.patch'):
+            key = unquote(path[len(USERS_PATH) + 1:]).lower()
+            with self._lock:
+                user = self.users.get(key)
+                if user is None:
+                    return 404, _error(404, "Resource Not Found: userKey", 'notFound'), {}
+                if name == 'users.delete':
+                    del self.users[key]
+                    return 204, None, {}
+                if name != 'users.get':
+                    user.update({k: v for k, v in json.loads(body or b'{}').items()
+                                 if k in ('suspended', 'orgUnitPath')})
+            return 200, user, {}
+
+        return 404, _error(404, "Not Found", 'notFound'), {}
+
+
+class FakeDirectoryHandler(http.server.BaseHTTPRequestHandler):
+    """HTTP front end for FakeDirectory, including the batch endpoint"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes, avoid Nagle delays
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        self._serve()
+
+    def do_POST(self):
+        self._serve()
+
+    def do_PUT(self):
+        self._serve()
+
+    def do_PATCH(self):
+        self._serve()
+
+    def do_DELETE(self):
+        self._serve()
+
+    def _serve(self):
+        directory = self.server.directory
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        with directory._lock:
+            directory.http_requests += 1
+
+        if urlparse(self.path).path in BATCH_PATHS:
+            status, content_type, payload, headers = self._batch(body)
+        else:
+            time.sleep(directory.latency)
+            status, response, headers = directory.handle(self.command, self.path, body)
+            content_type = 'application/json; charset=UTF-8'
+            payload = b'' if response is None else json.dumps(response).encode()
+
+        with directory._lock:
+            directory.bytes_sent += len(payload)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _batch(self, body: bytes) -> Tuple[int, str, bytes, Dict]:
+        """Split a multipart/mixed batch, serve each part and reassemble"""
+        directory = self.server.directory
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+        message = BytesParser(policy=policy.HTTP).parsebytes(header + body)
+        parts = list(message.iter_parts())
+
+        time.sleep(directory.latency + directory.item_latency * len(parts))
+
+        boundary = f"batch_{random.getrandbits(64):016x}"
+        chunks = []
+        for part in parts:
+            content_id = part['Content-ID'].strip('<>')
+            raw = part.get_payload(decode=True).decode().replace('\r\n', '\n')
+            head, _, request_body = raw.partition('\n\n')
+            method, target, _ = head.split('\n', 1)[0].split(' ', 2)
+            status, response, headers = directory.handle(method, target, request_body.encode())
+            lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}",
+                     "Content-Type: application/json; charset=UTF-8"]
+            lines.extend(f"{key}: {value}" for key, value in headers.items())
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                + "\r\n".join(lines) + "\r\n\r\n" + ('' if response is None else json.dumps(response)) + "\r\n"
+            )
+        payload = ("".join(chunks) + f"--{boundary}--\r\n").encode()
+        return 200, f"multipart/mixed; boundary={boundary}", payload, {}
+
+    def log_message(self, format, *args):
+        pass  # Suppress logs
+
+
+def start_server(directory: FakeDirectory) -> Tuple[http.server.ThreadingHTTPServer, str]:
+    """Serve a FakeDirectory on a free localhost port"""
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FakeDirectoryHandler)
+    server.daemon_threads = True
+    server.directory = directory
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def scenarios(args: argparse.Namespace) -> Dict[str, List[str]]:
+    """Engine configurations compared by the benchmark"""
+    batch, workers = str(args.batch_size), str(args.workers)
+    return {
+        'probing': ['--no-prefetch'],
+        'sequential': [],
+        'optimistic': ['--optimistic', '--no-prefetch'],
+        'batched': ['--batch-size', batch],
+        'workers': ['--workers', workers],
+        'workers+batched': ['--workers', workers, '--batch-size', batch],
+        'workers+pooled': ['--workers', workers, '--transport', 'requests'],
+        'batched+pooled': ['--batch-size', batch, '--transport', 'requests'],
+        'async': ['--async', str(args.inflight)],
+    }
+
+
+def build_directory(args: argparse.Namespace, manager: bot.GoogleWorkspaceManager) -> FakeDirectory:
+    """Create a fresh fake directory pre-populated with colliding users"""
+    directory = FakeDirectory(latency=args.latency, item_latency=args.item_latency,
+                              error_rate=args.error_rate, quota=args.quota,
+                              retry_after=args.retry_after, seed=args.seed)
+    planner = bot.NamePlanner(manager.first_names, manager.last_names, seed=args.seed + 1)
+    for _ in range(args.existing):
+        first_name, last_name, suffix = planner.next()
+        directory.add_user(bot.format_address(first_name, last_name, suffix, BENCH_DOMAIN),
+                           first_name, last_name)
+    return directory
+
+
+def run_scenario(name: str, engine_args: List[str], args: argparse.Namespace) -> Dict:
+    """Run one engine configuration against a fresh fake directory"""
+    options = bot.parse_args(engine_args + [
+        '--no-journal', '--no-cache', '--format', 'jsonl',
+        '--rate', str(args.rate), '--max-rate', str(args.max_rate)
+    ])
+    manager = bot.GoogleWorkspaceManager(options)
+    if not manager.load_configuration():
+        raise RuntimeError("Failed to load configuration")
+    manager.domain = BENCH_DOMAIN
+    manager.password = BENCH_PASSWORD
+    manager.planner = bot.NamePlanner(manager.first_names, manager.last_names, seed=args.seed)
+
+    directory = build_directory(args, manager)
+    server, url = start_server(directory)
+    options.api_endpoint = url
+
+    from google.oauth2.credentials import Credentials
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    os.chdir(workdir)
+    try:
+        started = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.connect(Credentials(token='benchmark'))
+            summary = manager.create_accounts(args.count)
+        wall = time.monotonic() - started
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        server.server_close()
+
+    latencies = []
+    if summary and summary['results_file']:
+        with open(os.path.join(workdir, summary['results_file']), encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('latency_ms') is not None:
+                    latencies.append(record['latency_ms'])
+
+    created = summary['successful'] if summary else 0
+    api_calls = sum(directory.calls.values())
+    return {
+        'scenario': name,
+        'args': engine_args,
+        'created': created,
+        'failed': summary['failed'] if summary else args.count,
+        'wall_seconds': round(wall, 3),
+        'accounts_per_second': round(created / wall, 2) if wall > 0 else None,
+        'latency_ms': {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        'api_calls': dict(directory.calls),
+        'http_requests': directory.http_requests,
+        'statuses': {str(k): v for k, v in directory.statuses.items()},
+        'calls_per_account': round(api_calls / created, 2) if created else None,
+        'http_per_account': round(directory.http_requests / created, 2) if created else None,
+        'client_metrics': summary['metrics'] if summary else None
+    }
+
+
+def print_report(results: List[Dict]):
+    """Print a comparison table"""
+    header = (f"{'Scenario':<18}{'Created':>8}{'Failed':>8}{'Wall s':>9}{'Acct/s':>9}"
+              f"{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'Calls/acct':>12}{'HTTP/acct':>11}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        lat = r['latency_ms']
+        cells = [lat['p50'], lat['p95'], lat['p99']]
+        print(f"{r['scenario']:<18}{r['created']:>8}{r['failed']:>8}{r['wall_seconds']:>9.2f}"
+              f"{r['accounts_per_second'] or 0:>9.2f}"
+              + "".join(f"{'-' if c is None else c:>8}" for c in cells)
+              + f"{r['calls_per_account'] or '-':>12}{r['http_per_account'] or '-':>11}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse benchmark options"""
+    parser = argparse.ArgumentParser(description="Offline benchmark against a local fake Directory API")
+    parser.add_argument('--count', type=int, default=200, help="Accounts per scenario (default: 200)")
+    parser.add_argument('--scenarios', default='all',
+                        help="Comma-separated scenarios to run (default: all)")
+    parser.add_argument('--batch-size', type=int, default=50, help="Batch size for batched scenarios (default: 50)")
+    parser.add_argument('--workers', type=int, default=8, help="Workers for concurrent scenarios (default: 8)")
+    parser.add_argument('--inflight', type=int, default=64,
+                        help="Requests in flight for the async scenario (default: 64)")
+    parser.add_argument('--existing', type=int, default=100,
+                        help="Users already in the directory, drawn from the same names (default: 100)")
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help="Seconds added to every HTTP request (default: 0.02)")
+    parser.add_argument('--item-latency', type=float, default=0.001,
+                        help="Seconds added per call inside a batch (default: 0.001)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of calls failing with 503 backendError (default: 0)")
+    parser.add_argument('--quota', type=float, default=0.0,
+                        help="Calls per second before 403 quotaExceeded, 0 for unlimited (default: 0)")
+    parser.add_argument('--retry-after', type=float,
+                        help="Retry-After seconds sent with quota errors")
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help="Initial client rate passed to the tool (default: 1000)")
+    parser.add_argument('--max-rate', type=float, default=1000.0,
+                        help="Client rate ceiling passed to the tool (default: 1000)")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for repeatable runs (default: 1)")
+    parser.add_argument('--json', metavar='FILE', help="Also write the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="Show the tool's log output")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Benchmark entry point"""
+    args = parse_args()
+    if not args.verbose:
+        bot.logger.setLevel(logging.WARNING)
+
+    available = scenarios(args)
+    selected = list(available) if args.scenarios == 'all' else args.scenarios.split(',')
+    unknown = [name for name in selected if name not in available]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(available)})")
+
+    print(f"Benchmark: {args.count} accounts, {args.existing} existing users, "
+          f"latency {args.latency * 1000:g}ms, error rate {args.error_rate:g}, "
+          f"quota {args.quota or 'unlimited'}")
+    print()
+
+    results = []
+    for name in selected:
+        random.seed(args.seed)
+        results.append(run_scenario(name, available[name], args))
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
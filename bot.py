@@ -7,40 +7,1641 @@ Professional tool for automated user account creation in Google Workspace
 import os
 import sys
 import json
+import argparse
 import random
 import time
 import platform
 import logging
+import logging.handlers
+import csv
+import queue
+import sqlite3
+import struct
+import hashlib
+import mmap
+import threading
+import secrets
+import string
+import warnings
+import importlib.util
+from array import array
+from collections import deque
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import List, Tuple, Optional, Dict
+from urllib.parse import quote
+from itertools import chain, islice
+from typing import List, Tuple, Optional, Dict, Iterator, Iterable
+
+LAUNCH_TIME = time.monotonic()  # Reference point for startup timing
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Constants
 SCOPES = ['https://www.googleapis.com/auth/admin.directory.user']
+GROUP_SCOPE = 'https://www.googleapis.com/auth/admin.directory.group'  # Requested only when groups are used
 CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.json'
 DOMAIN_FILE = 'domain.txt'
 PASSWORD_FILE = 'password.txt'
 NAME_FILE = 'nama.txt'
+NAME_CACHE_FILE = 'nama.cache'  # Compiled, deduplicated copy of NAME_FILE
+NAME_CACHE_HEADER = struct.Struct('<8sqq32sII')  # magic, mtime_ns, size, sha256, first count, last count
+NAME_CACHE_MAGIC = b'NAMEDB1\0'
 PORT = 8080
-RATE_LIMIT_DELAY = 0.5  # Delay between API calls
+HTTP_TIMEOUT = 60  # Seconds before an API request is abandoned
+TOKEN_REFRESH_MARGIN = 600  # Seconds before expiry to refresh the access token
+TOKEN_RETRY_DELAY = 30  # Seconds between failed background refresh attempts
+RATE_LIMIT_DELAY = 0.5  # Initial delay between API calls
+MAX_API_RATE = 40.0  # Upper bound for API calls per second
+MIN_API_RATE = 0.2  # Lower bound after repeated throttling
+RATE_INCREASE = 2.0  # Calls/second added per second of successful calls
+RATE_DECREASE = 0.5  # Rate multiplier applied when throttled
+MAX_RETRIES = 6  # Retries for throttled or failed API calls
+BACKOFF_BASE = 1.0  # Seconds, doubled on every retry
+MAX_BACKOFF = 64.0  # Seconds
+THROTTLE_REASONS = ('quotaExceeded', 'rateLimitExceeded', 'userRateLimitExceeded')
+MAX_CONFLICT_RETRIES = 20  # Suffixes tried per account when inserts hit existing addresses
+MAX_BATCH_SIZE = 1000  # Admin SDK limit for calls per batch request
+LIST_PAGE_SIZE = 500  # Maximum users returned per users.list page
+CACHE_FILE = 'directory_cache.db'
+CACHE_MAX_AGE = 24  # Hours before the directory cache is fully re-synced
+CACHE_COMMIT_INTERVAL = 100  # Pending cache writes before committing
+RESULT_FORMATS = {'text': 'txt', 'csv': 'csv', 'jsonl': 'jsonl'}
+RESULT_FIELDS = ['email', 'password', 'first_name', 'last_name', 'id', 'creation_time', 'latency_ms']
+RESULTS_FLUSH_INTERVAL = 2.0  # Seconds between flushes of the results file
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PREFIX = 'workspace_bulk'
+JOURNAL_FILE = 'journal_{timestamp}.jsonl'
+PLAN_FILE = 'plan_{timestamp}.jsonl'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+PROGRESS_INTERVAL = 1.0  # Seconds between progress refreshes on a terminal
+PROGRESS_LOG_INTERVAL = 10.0  # Seconds between progress lines when output is not a terminal
+PASSWORD_LENGTH = 16  # Characters in generated per-user passwords
+PASSWORD_CHUNK = 256  # Passwords generated and hashed per worker-process task
+PASSWORD_QUEUE_SIZE = 4096  # Hashed passwords kept ready ahead of creation
+HASH_FUNCTIONS = ('crypt', 'SHA-1')
+GROUP_BATCH_SIZE = 100  # Member inserts per batch HTTP request
+GROUP_BATCH_WAIT = 0.5  # Seconds to wait for a fuller batch of member inserts
+LEASE_SECONDS = 300.0  # Seconds a queue worker holds claimed accounts before they return to the queue
+QUEUE_POLL_INTERVAL = 2.0  # Seconds between polls while other workers hold the remaining leases
+ROLLBACK_BATCH_SIZE = 100  # Default calls per batch when rolling back a run
+VERIFY_BATCH_SIZE = 100  # Default users.get calls per batch when verifying leftovers
+VERIFY_FIELDS = 'id,primaryEmail,suspended,creationTime'  # Only what verification compares
+IMPORT_COLUMNS = {  # Accepted import column names (lowercase, without '_') per field
+    'first_name': ('firstname', 'givenname', 'first'),
+    'last_name': ('lastname', 'familyname', 'last'),
+    'email': ('email', 'primaryemail'),
+    'password': ('password',),
+    'org_unit': ('orgunit', 'orgunitpath'),
+    'groups': ('groups', 'group')
+}
+JOURNAL_SYNC_INTERVAL = 1.0  # Seconds between fsyncs of outcome records
+CLOCK_SKEW_SECONDS = 5.0  # Slack when comparing the server's creationTime with local journal times
+
+@lru_cache(maxsize=None)
+def _discovery_document(api_endpoint: Optional[str] = None) -> Dict:
+    """Load the Directory API discovery document bundled with the client, once"""
+    from googleapiclient.discovery_cache import get_static_doc
+    
+    document = get_static_doc('admin', 'directory_v1')
+    if document is None:
+        raise RuntimeError("Bundled discovery document for admin directory_v1 not found")
+    document = json.loads(document)
+    if api_endpoint:
+        # rootUrl also drives the batch endpoint, so override it in the document
+        document['rootUrl'] = api_endpoint.rstrip('/') + '/'
+    return document
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    """Return the HTTP status of an API error, if any"""
+    resp = getattr(error, 'resp', None)
+    return getattr(resp, 'status', None)
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """Check whether an API error is transient and worth retrying"""
+    status = _http_status(error)
+    if status is None:
+        return False
+    if status == 429 or status >= 500:
+        return True
+    return status == 403 and any(reason in str(error) for reason in THROTTLE_REASONS)
+
+
+def created_since(user: Dict, timestamp: Optional[float]) -> bool:
+    """Whether a directory user was created at or after a local timestamp"""
+    created = user.get('creationTime')
+    if not created or timestamp is None:
+        return False
+    try:
+        when = datetime.fromisoformat(created.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return False
+    return when >= timestamp - CLOCK_SKEW_SECONDS
+
+
+def is_same_person(user: Dict, spec: Dict) -> bool:
+    """Whether a directory user carries the name planned for an account"""
+    name = user.get('name') or {}
+    return (str(name.get('givenName', '')).casefold() == spec['first_name'].casefold()
+            and str(name.get('familyName', '')).casefold() == spec['last_name'].casefold())
+
+
+def is_conflict_error(error: Exception) -> bool:
+    """Check whether an insert failed because the address is taken"""
+    return _http_status(error) == 409 or 'Entity already exists' in str(error)
+
+
+def is_member_exists_error(error: Exception) -> bool:
+    """Check whether a member insert failed because the user is already in the group"""
+    return _http_status(error) == 409 or 'Member already exists' in str(error)
+
+
+def http_response(status: int, reason: str, headers) -> object:
+    """Build the httplib2-style response googleapiclient expects"""
+    import httplib2
+    
+    info = {key.lower(): value for key, value in headers.items()}
+    info['status'] = str(status)
+    resp = httplib2.Response(info)
+    resp.reason = reason
+    return resp
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Extract the Retry-After delay from an API error"""
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if hasattr(resp, 'get') else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, min(MAX_BACKOFF, BACKOFF_BASE * (2 ** attempt)))
+    return max(delay, retry_after or 0.0)
+
+
+class RateController:
+    """Adaptive token bucket shared by every API call path (AIMD)
+    
+    Starts in slow start, growing by one call/second per success (doubling
+    every second) until the first throttle, then increases additively.
+    """
+    
+    def __init__(self, rate: float, max_rate: float = MAX_API_RATE, min_rate: float = MIN_API_RATE):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max(self.min_rate, min(rate, max_rate))
+        self.tokens = 1.0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self._lock = threading.Lock()
+    
+    def _refill(self, now: float):
+        burst = max(1.0, self.rate)
+        self.tokens = min(burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, count: int = 1) -> float:
+        """Reserve tokens for count calls and return how long to wait before sending"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= count
+            return max(0.0, -self.tokens / self.rate, self._blocked_until - now)
+    
+    def acquire(self, count: int = 1) -> float:
+        """Reserve tokens for count calls, sleeping until they are available"""
+        wait = self.reserve(count)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    def on_success(self, count: int = 1):
+        """Additive increase after successful calls"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._slow_start:
+                self.rate = min(self.max_rate, self.rate + count)
+            else:
+                self.rate = min(self.max_rate, self.rate + RATE_INCREASE * count / self.rate)
+    
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease and optional pause after a throttled call"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._slow_start = False
+            # One decrease per interval, a burst of rejections is one signal
+            if now - self._last_decrease >= max(1.0, 1.0 / self.rate):
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+def _operation_name(request) -> str:
+    """Short API method name of a request, e.g. users.insert"""
+    method_id = getattr(request, 'methodId', None) or 'unknown'
+    return method_id.split('.', 1)[1] if method_id.startswith('directory.') else method_id
+
+
+class Metrics:
+    """Latency histograms, status counters and blocked/busy time for a run"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}  # operation -> [bucket counts..., +Inf count, sum]
+        self.calls = {}  # (operation, status) -> count
+        self.blocked = {}  # reason -> seconds
+        self.busy = 0.0
+        self.accounts = {}  # outcome -> count
+        self.gauges = {}
+    
+    def observe(self, operation: str, seconds: float, status: object, busy: bool = True):
+        """Record one call's latency and outcome"""
+        with self._lock:
+            histogram = self.histograms.setdefault(operation, [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += seconds
+            key = (operation, str(status))
+            self.calls[key] = self.calls.get(key, 0) + 1
+            if busy:
+                self.busy += seconds
+    
+    def count(self, operation: str, status: object):
+        """Count a call whose latency is accounted elsewhere (batch items)"""
+        with self._lock:
+            key = (operation, str(status))
+            self.calls[key] = self.calls.get(key, 0) + 1
+    
+    def add_blocked(self, reason: str, seconds: float):
+        """Record time spent waiting instead of working"""
+        if seconds > 0:
+            with self._lock:
+                self.blocked[reason] = self.blocked.get(reason, 0.0) + seconds
+    
+    def add_account(self, outcome: str):
+        with self._lock:
+            self.accounts[outcome] = self.accounts.get(outcome, 0) + 1
+    
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+    
+    def _quantile(self, histogram: List, q: float) -> Optional[float]:
+        """Estimate a quantile from histogram buckets (bucket upper bound)"""
+        total = sum(histogram[:-1])
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            seen += histogram[i]
+            if seen >= rank:
+                return bound
+        return float('inf')
+    
+    def summary(self) -> Dict:
+        """JSON-friendly snapshot of all metrics"""
+        with self._lock:
+            operations = {}
+            for operation, histogram in self.histograms.items():
+                count = sum(histogram[:-1])
+                operations[operation] = {
+                    'count': count,
+                    'mean_seconds': round(histogram[-1] / count, 4) if count else None,
+                    'p50_seconds': self._quantile(histogram, 0.50),
+                    'p95_seconds': self._quantile(histogram, 0.95),
+                    'p99_seconds': self._quantile(histogram, 0.99)
+                }
+            statuses = {}
+            for (operation, status), count in self.calls.items():
+                statuses.setdefault(operation, {})[status] = count
+            return {
+                'operations': operations,
+                'statuses': statuses,
+                'busy_seconds': round(self.busy, 3),
+                'blocked_seconds': {k: round(v, 3) for k, v in self.blocked.items()},
+                'accounts': dict(self.accounts),
+                'gauges': dict(self.gauges)
+            }
+    
+    def render_prometheus(self) -> str:
+        """Render metrics in the Prometheus text exposition format"""
+        p = METRICS_PREFIX
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {p}_api_call_seconds API call latency by operation")
+            lines.append(f"# TYPE {p}_api_call_seconds histogram")
+            for operation, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    cumulative += histogram[i]
+                    lines.append(f'{p}_api_call_seconds_bucket{{operation="{operation}",le="{bound}"}} {cumulative}')
+                cumulative += histogram[len(LATENCY_BUCKETS)]
+                lines.append(f'{p}_api_call_seconds_bucket{{operation="{operation}",le="+Inf"}} {cumulative}')
+                lines.append(f'{p}_api_call_seconds_sum{{operation="{operation}"}} {histogram[-1]:.6f}')
+                lines.append(f'{p}_api_call_seconds_count{{operation="{operation}"}} {cumulative}')
+            
+            lines.append(f"# HELP {p}_api_calls_total API calls by operation and HTTP status")
+            lines.append(f"# TYPE {p}_api_calls_total counter")
+            for (operation, status), count in sorted(self.calls.items()):
+                lines.append(f'{p}_api_calls_total{{operation="{operation}",status="{status}"}} {count}')
+            
+            lines.append(f"# HELP {p}_blocked_seconds_total Time spent waiting by reason")
+            lines.append(f"# TYPE {p}_blocked_seconds_total counter")
+            for reason, seconds in sorted(self.blocked.items()):
+                lines.append(f'{p}_blocked_seconds_total{{reason="{reason}"}} {seconds:.6f}')
+            
+            lines.append(f"# HELP {p}_busy_seconds_total Time spent in API calls")
+            lines.append(f"# TYPE {p}_busy_seconds_total counter")
+            lines.append(f"{p}_busy_seconds_total {self.busy:.6f}")
+            
+            lines.append(f"# HELP {p}_accounts_total Accounts processed by outcome")
+            lines.append(f"# TYPE {p}_accounts_total counter")
+            for outcome, count in sorted(self.accounts.items()):
+                lines.append(f'{p}_accounts_total{{outcome="{outcome}"}} {count}')
+            
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {p}_{name} gauge")
+                lines.append(f"{p}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics: Metrics, port: int):
+    """Serve metrics on http://127.0.0.1:<port>/metrics in a background thread"""
+    import http.server
+    
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] == '/metrics':
+                body = metrics.render_prometheus().encode()
+                content_type = 'text/plain; version=0.0.4'
+            elif self.path.split('?')[0] == '/metrics.json':
+                body = json.dumps(metrics.summary()).encode()
+                content_type = 'application/json'
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass  # Suppress logs
+    
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics', daemon=True)
+    thread.start()
+    return server
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, including extra fields"""
+    
+    STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+    
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        event.update((k, v) for k, v in vars(record).items() if k not in self.STANDARD)
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def configure_logging(json_format: bool = False) -> logging.handlers.QueueListener:
+    """Route all logging through a queue drained by a background listener"""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    return listener
+
+
+class ProgressRenderer:
+    """Console progress redrawn at a fixed interval from a background thread
+    
+    Workers only bump counters; the terminal is written at most once per
+    interval no matter how fast accounts complete.
+    """
+    
+    def __init__(self, total: int, stream=None, label: Optional[str] = None):
+        self.total = total
+        self.created = 0
+        self.failed = 0
+        self.stream = stream or sys.stdout
+        self.label = label
+        # Several labelled renderers share the terminal, so they print lines instead of redrawing
+        self.interactive = self.stream.isatty() and label is None
+        self.interval = PROGRESS_INTERVAL if self.interactive else PROGRESS_LOG_INTERVAL
+        self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress', daemon=True)
+    
+    def record(self, created: bool):
+        """Count one finished account"""
+        if created:
+            self.created += 1
+        else:
+            self.failed += 1
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        """Stop refreshing and draw the final state"""
+        self._stop.set()
+        self._thread.join()
+        self._render(final=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._render()
+    
+    def _render(self, final: bool = False):
+        done = self.created + self.failed
+        total = max(self.total, done)
+        elapsed = time.monotonic() - self._started
+        rate = done / elapsed if elapsed > 0 else 0
+        eta = (total - done) / rate if rate > 0 else 0
+        percent = done / total * 100 if total else 100
+        line = (f"{f'[{self.label}] ' if self.label else ''}Progress: {done}/{total} ({percent:.0f}%) - {self.created} created, "
+                f"{self.failed} failed - {rate:.1f}/s - ETA: {int(eta)}s")
+        if self.interactive:
+            self.stream.write("\r" + line.ljust(79) + ("\n" if final else ""))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+def generate_password(length: int = PASSWORD_LENGTH) -> str:
+    """Random password with lower and upper case letters, digits and symbols"""
+    alphabet = string.ascii_letters + string.digits + '!@#$%^&*-_=+'
+    while True:
+        password = ''.join(secrets.choice(alphabet) for _ in range(max(length, 8)))
+        if (any(c.islower() for c in password) and any(c.isupper() for c in password)
+                and any(c.isdigit() for c in password) and not password.isalnum()):
+            return password
+
+
+def hash_password(password: str, hash_function: str) -> str:
+    """Hash a password in a format accepted by the users.insert hashFunction field"""
+    if hash_function == 'SHA-1':
+        return hashlib.sha1(password.encode('utf-8')).hexdigest()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import crypt
+    return crypt.crypt(password, crypt.mksalt(crypt.METHOD_SHA512))
+
+
+def hash_function_available(hash_function: str) -> bool:
+    """Whether this Python can produce hashes for hash_function"""
+    if hash_function != 'crypt':
+        return True
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            import crypt
+    except ImportError:
+        # Not on Windows, and removed from the standard library in Python 3.13
+        return False
+    return crypt.METHOD_SHA512 in crypt.methods
+
+
+def make_passwords(count: int, length: int, hash_function: str) -> List[Tuple[str, str]]:
+    """Generate and hash count passwords; runs in a worker process"""
+    passwords = []
+    for _ in range(count):
+        password = generate_password(length)
+        passwords.append((password, hash_password(password, hash_function)))
+    return passwords
+
+
+class PasswordStage:
+    """Generates and hashes per-user passwords ahead of creation in worker processes
+    
+    Salted crypt hashing is CPU-bound, so it runs in a process pool; a
+    feeder thread keeps a bounded queue of (plaintext, hash) pairs topped up
+    for the creation loop.
+    """
+    
+    def __init__(self, length: int, hash_function: str, processes: Optional[int] = None):
+        self.length = length
+        self.hash_function = hash_function
+        self.processes = processes or os.cpu_count() or 1
+        self._queue = queue.Queue(maxsize=PASSWORD_QUEUE_SIZE)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        
+        self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._feed, name='password-feeder', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def take(self) -> Tuple[str, str]:
+        """Return the next (plaintext, hash) pair, waiting if the stage is behind"""
+        while True:
+            try:
+                return self._queue.get(timeout=1)
+            except queue.Empty:
+                if self._error is not None:
+                    raise RuntimeError(f"Password generation failed: {self._error}")
+    
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _feed(self):
+        pending = deque()
+        try:
+            while not self._stop.is_set():
+                while len(pending) < self.processes * 2:
+                    pending.append(self._executor.submit(make_passwords, PASSWORD_CHUNK,
+                                                         self.length, self.hash_function))
+                for item in pending.popleft().result():
+                    while not self._stop.is_set():
+                        try:
+                            self._queue.put(item, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+        except Exception as e:
+            if not self._stop.is_set():
+                self._error = e
+                logger.error("Password generation failed: %s", e)
+
+
+def domain_path(path: str, domain: str) -> str:
+    """Tag a file name with a domain, e.g. journal_1.jsonl -> journal_1_example.com.jsonl"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{domain}{ext}"
+
+
+def write_file_atomic(path: str, content: str):
+    """Replace a file in one step so readers never see a partial write"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class CredentialsManager:
+    """Refreshes OAuth credentials in the background well before they expire
+    
+    Every service shares the same credentials object, so once the refresher
+    has swapped in a new token all call paths pick it up on their next
+    request without ever refreshing on their own critical path.
+    """
+    
+    def __init__(self, credentials, token_file: str = TOKEN_FILE,
+                 margin: float = TOKEN_REFRESH_MARGIN):
+        self.credentials = credentials
+        self.token_file = token_file
+        self.margin = margin
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def seconds_until_refresh(self) -> Optional[float]:
+        """Seconds until the token should be refreshed, None if it never expires"""
+        expiry = getattr(self.credentials, 'expiry', None)
+        if expiry is None:
+            return None
+        # google-auth keeps expiry as naive UTC
+        return (expiry - datetime.utcnow()).total_seconds() - self.margin
+    
+    def refresh(self):
+        """Refresh the token now and persist it"""
+        from google.auth.transport.requests import Request
+        
+        self.credentials.refresh(Request())
+        write_file_atomic(self.token_file, self.credentials.to_json())
+        logger.info("Token refreshed in background, valid until %s UTC", self.credentials.expiry)
+    
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.seconds_until_refresh()
+            if wait is None:
+                return
+            if wait > 0:
+                self._stop.wait(wait)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Background token refresh failed, retrying in %ds: %s", TOKEN_RETRY_DELAY, e)
+                self._stop.wait(TOKEN_RETRY_DELAY)
+    
+    def start(self):
+        """Start the background refresher if the credentials can be refreshed"""
+        if not getattr(self.credentials, 'refresh_token', None) or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop the background refresher"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class PooledHttp:
+    """httplib2-compatible transport over a pooled, keep-alive requests session
+    
+    A single instance is shared by every worker. Connections are reused from
+    a pool sized to the concurrency, so TLS handshakes are paid once per
+    connection instead of once per request.
+    """
+    
+    def __init__(self, credentials, pool_size: int, timeout: float = HTTP_TIMEOUT):
+        import requests
+        from google.auth.transport.requests import AuthorizedSession
+        
+        self.credentials = credentials  # Read by googleapiclient to authorize batch parts
+        self.timeout = timeout
+        self.session = AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                                pool_block=True, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip'
+    
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5,
+                connection_type=None):
+        """Perform a request and return an (httplib2.Response, content) pair"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        response = self.session.request(method, uri, data=body, headers=headers,
+                                        timeout=self.timeout, allow_redirects=redirections > 0)
+        resp = http_response(response.status_code, response.reason, response.headers)
+        # Content arrives already decompressed
+        resp.pop('content-encoding', None)
+        resp['content-length'] = str(len(response.content))
+        return resp, response.content
+    
+    def close(self):
+        self.session.close()
+
+
+class DirectoryCache:
+    """Persistent SQLite cache of known addresses per domain"""
+    
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "email TEXT PRIMARY KEY, domain TEXT NOT NULL, user_id TEXT, updated_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS users_domain ON users(domain)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+    
+    def last_sync(self, domain: str) -> Optional[float]:
+        """Return the time of the last full sync for a domain"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (f"last_sync:{domain}",)
+            ).fetchone()
+        return float(row[0]) if row else None
+    
+    def is_fresh(self, domain: str, max_age_hours: float) -> bool:
+        """Check whether the domain was fully synced recently enough"""
+        synced = self.last_sync(domain)
+        return synced is not None and (time.time() - synced) < max_age_hours * 3600
+    
+    def replace_domain(self, domain: str, entries: List[Tuple[str, Optional[str]]]):
+        """Replace all cached addresses of a domain with a full listing"""
+        now = time.time()
+        with self._lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM users WHERE domain = ?", (domain,))
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO users (email, domain, user_id, updated_at) VALUES (?, ?, ?, ?)",
+                    ((email.lower(), domain, user_id, now) for email, user_id in entries)
+                )
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    (f"last_sync:{domain}", str(now))
+                )
+            self._pending = 0
+    
+    def add(self, email: str, domain: str, user_id: Optional[str] = None):
+        """Record a single address, committing periodically"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO users (email, domain, user_id, updated_at) VALUES (?, ?, ?, ?)",
+                (email.lower(), domain, user_id, time.time())
+            )
+            self._pending += 1
+            if self._pending >= CACHE_COMMIT_INTERVAL:
+                self.conn.commit()
+                self._pending = 0
+    
+    def remove(self, email: str):
+        """Forget an address that no longer exists in the directory"""
+        with self._lock:
+            self.conn.execute("DELETE FROM users WHERE email = ?", (email.lower(),))
+            self._pending += 1
+            if self._pending >= CACHE_COMMIT_INTERVAL:
+                self.conn.commit()
+                self._pending = 0
+    
+    def emails(self, domain: str) -> set:
+        """Load all cached addresses of a domain"""
+        with self._lock:
+            rows = self.conn.execute("SELECT email FROM users WHERE domain = ?", (domain,))
+            return {row[0] for row in rows}
+    
+    def count(self, domain: str) -> int:
+        """Number of cached addresses of a domain"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users WHERE domain = ?", (domain,)).fetchone()[0]
+    
+    def close(self):
+        """Commit pending writes and close the database"""
+        with self._lock:
+            self.conn.commit()
+            self.conn.close()
+
+
+class NameTable:
+    """Read-only sequence of names stored as one UTF-8 blob plus an offset array"""
+    
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("name index out of range")
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+    
+    def __iter__(self) -> Iterator[str]:
+        return (self[i] for i in range(len(self)))
+
+
+def _file_sha256(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def parse_name_file(path: str) -> Tuple[List[str], List[str]]:
+    """Read first and last names, dropping case-insensitive duplicates"""
+    names = {'DEPAN': [], 'BELAKANG': []}
+    seen = {'DEPAN': set(), 'BELAKANG': set()}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                parts = line.split()
+                kind = parts[0].upper()
+                if len(parts) > 1 and kind in names:
+                    for name in parts[1:]:
+                        # Addresses are lowercase, so "Budi" and "budi" are one name
+                        key = name.casefold()
+                        if key not in seen[kind]:
+                            seen[kind].add(key)
+                            names[kind].append(name)
+    return names['DEPAN'], names['BELAKANG']
+
+
+def compile_name_file(path: str, cache_path: str) -> Tuple[NameTable, NameTable]:
+    """Parse a name file and store it in the compiled cache format"""
+    stat = os.stat(path)
+    first_names, last_names = parse_name_file(path)
+    
+    sections = []
+    for names in (first_names, last_names):
+        offsets = array('I', [0])
+        blob = bytearray()
+        for name in names:
+            blob += name.encode('utf-8')
+            offsets.append(len(blob))
+        sections.append((offsets, bytes(blob)))
+    
+    header = NAME_CACHE_HEADER.pack(NAME_CACHE_MAGIC, stat.st_mtime_ns, stat.st_size,
+                                    _file_sha256(path), len(first_names), len(last_names))
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for offsets, _ in sections:
+            f.write(offsets.tobytes())
+        for _, blob in sections:
+            f.write(blob)
+        f.flush()
+        # A crash must never leave a renamed but partly written cache behind
+        os.fsync(f.fileno())
+    os.replace(tmp_path, cache_path)
+    return tuple(NameTable(blob, offsets) for offsets, blob in sections)
+
+
+def open_name_cache(path: str, cache_path: str) -> Optional[Tuple[NameTable, NameTable]]:
+    """Map a compiled name cache, None when missing or out of date"""
+    try:
+        with open(cache_path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    
+    if len(data) < NAME_CACHE_HEADER.size:
+        return None
+    magic, mtime_ns, size, digest, first_count, last_count = NAME_CACHE_HEADER.unpack_from(data)
+    if magic != NAME_CACHE_MAGIC or array('I').itemsize != 4:
+        return None
+    # The file must be exactly as long as its header says, a truncated cache is rebuilt
+    blobs_start = NAME_CACHE_HEADER.size + 4 * (first_count + 1) + 4 * (last_count + 1)
+    if len(data) < blobs_start:
+        return None
+    first_size, = struct.unpack_from('<I', data, blobs_start - 4 * (last_count + 2))
+    last_size, = struct.unpack_from('<I', data, blobs_start - 4)
+    if len(data) != blobs_start + first_size + last_size:
+        return None
+    stat = os.stat(path)
+    if stat.st_size != size:
+        return None
+    if stat.st_mtime_ns != mtime_ns:
+        if _file_sha256(path) != digest:
+            return None
+        # Touched but unchanged, keep the cache and skip the hash next time
+        try:
+            with open(cache_path, 'r+b') as f:
+                f.write(NAME_CACHE_HEADER.pack(magic, stat.st_mtime_ns, size, digest, first_count, last_count))
+        except OSError:
+            pass
+    
+    view = memoryview(data)
+    start = NAME_CACHE_HEADER.size
+    first_offsets = view[start:start + 4 * (first_count + 1)].cast('I')
+    start += 4 * (first_count + 1)
+    last_offsets = view[start:start + 4 * (last_count + 1)].cast('I')
+    start += 4 * (last_count + 1)
+    first_blob = view[start:start + first_offsets[-1]]
+    last_blob = view[start + first_offsets[-1]:start + first_offsets[-1] + last_offsets[-1]]
+    return NameTable(first_blob, first_offsets), NameTable(last_blob, last_offsets)
+
+
+def load_names(path: str, cache_path: Optional[str] = NAME_CACHE_FILE) -> Tuple[List[str], List[str]]:
+    """Load first and last names, through the compiled cache when possible"""
+    if not os.path.exists(path):
+        return [], []
+    if cache_path:
+        names = open_name_cache(path, cache_path)
+        if names is not None:
+            return names
+        try:
+            return compile_name_file(path, cache_path)
+        except OSError as e:
+            logger.warning("Failed to write name cache %s: %s", cache_path, e)
+    return parse_name_file(path)
+
+
+class NamePlanner:
+    """Random walk over the first x last name product without materializing it
+    
+    Each pass visits every name pair exactly once in a keyed pseudo-random
+    order (a Feistel permutation with cycle walking). Pass 0 yields plain
+    base addresses, pass n yields the same pairs with suffix n.
+    """
+    
+    ROUNDS = 4
+    
+    def __init__(self, first_names: List[str], last_names: List[str], seed: Optional[int] = None):
+        self.first_names = first_names
+        self.last_names = last_names
+        self.size = len(first_names) * len(last_names)
+        rng = random.Random(seed)
+        self._half = max(1, ((self.size - 1).bit_length() + 1) // 2)
+        self._mask = (1 << self._half) - 1
+        self._keys = [rng.getrandbits(32) for _ in range(self.ROUNDS)]
+        self._position = 0
+        self._lock = threading.Lock()
+    
+    def _round(self, value: int, key: int) -> int:
+        value = ((value ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+        value ^= value >> 16
+        return ((value * 0x45D9F3B) & 0xFFFFFFFF) ^ (value >> 13)
+    
+    def _permute(self, value: int) -> int:
+        """Map an offset to a unique pair index in [0, size)"""
+        while True:
+            left, right = value >> self._half, value & self._mask
+            for key in self._keys:
+                left, right = right, left ^ (self._round(right, key) & self._mask)
+            value = (left << self._half) | right
+            if value < self.size:
+                return value
+    
+    def candidate(self, position: int) -> Tuple[str, str, int]:
+        """Return (first name, last name, suffix) at a position of the walk"""
+        suffix, offset = divmod(position, self.size)
+        pair = self._permute(offset)
+        first_index, last_index = divmod(pair, len(self.last_names))
+        return self.first_names[first_index], self.last_names[last_index], suffix
+    
+    def next(self) -> Tuple[str, str, int]:
+        """Return the next candidate of the walk"""
+        with self._lock:
+            position = self._position
+            self._position += 1
+        return self.candidate(position)
+
+
+def base_address(first_name: str, last_name: str) -> str:
+    """Local part shared by every numbered variant of a name pair"""
+    return f"{first_name.lower()}.{last_name.lower()}"
+
+
+def format_address(first_name: str, last_name: str, suffix: int, domain: str) -> str:
+    """Build an address from a name pair and numeric suffix (0 for none)"""
+    return f"{base_address(first_name, last_name)}{suffix or ''}@{domain}"
+
+
+def address_suffix(email: str, first_name: str, last_name: str) -> int:
+    """Return the numeric suffix of an address built by format_address"""
+    rest = email.split('@')[0].lower()[len(base_address(first_name, last_name)):]
+    return int(rest) if rest.isdigit() else 0
+
+
+def read_import_rows(path: str) -> Iterator[Optional[Dict]]:
+    """Stream the rows of a CSV or JSONL import file, None for unparseable lines"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row if isinstance(row, dict) else None
+        else:
+            yield from csv.DictReader(f)
+
+
+def normalize_import_row(row: Dict) -> Dict:
+    """Map an import row's columns onto account spec fields, ValueError for values that are not text"""
+    values = {str(key).lower().replace('_', '').strip(): value for key, value in row.items() if key}
+    spec = {}
+    for field, names in IMPORT_COLUMNS.items():
+        for name in names:
+            value = values.get(name)
+            if value is None:
+                continue
+            if field == 'groups' and isinstance(value, list) and all(isinstance(v, str) for v in value):
+                # JSONL rows may list groups as an array
+                value = ' '.join(value)
+            if not isinstance(value, (str, int, float)):
+                raise ValueError(f"{field} must be text, not {type(value).__name__}")
+            # JSONL numbers are taken as their text, e.g. a numeric password
+            value = str(value).strip()
+            if field == 'groups':
+                value = value.replace(';', ' ').split()
+            if value:
+                spec[field] = value
+                break
+    return spec
+
+
+def import_columns(path: str) -> set:
+    """Spec fields present in the first row of an import file"""
+    first = next(iter(read_import_rows(path)), None) or {}
+    keys = {str(key).lower().replace('_', '').strip() for key in first if key}
+    return {field for field, names in IMPORT_COLUMNS.items() if keys & set(names)}
+
+
+def count_import_rows(path: str) -> int:
+    """Estimate the rows of an import file from its line count"""
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        return lines
+    return max(lines - 1, 0)  # CSV header
+
+
+def estimate_duration(count: int, rate: float, max_rate: float, batch_size: int,
+                      workers: int, latency: float) -> Dict[str, float]:
+    """Estimate the wall time of creating count accounts, in seconds
+    
+    Replays the rate controller's slow start without throttling: each round
+    sends one request per worker and takes the longer of the token wait and
+    the round trip.
+    """
+    rate = max(min(rate, max_rate), MIN_API_RATE)
+    size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    quota = round_trips = total = 0.0
+    remaining = count
+    while remaining > 0:
+        calls = min(size * max(1, workers), remaining)
+        wait = calls / rate
+        quota += wait
+        round_trips += latency
+        total += max(wait, latency)
+        rate = min(max_rate, rate + calls)
+        remaining -= calls
+    return {
+        'quota_seconds': round(quota, 1),
+        'latency_seconds': round(round_trips, 1),
+        'total_seconds': round(total, 1)
+    }
+
+
+def read_rollback_targets(path: str) -> Tuple[List[str], Dict[str, Optional[float]]]:
+    """Collect the addresses of accounts made by a run from its results file or journal
+    
+    Returns the confirmed addresses and, for a journal, the addresses planned
+    without a recorded outcome mapped to the time they were planned.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        first = next((line for line in f if line.strip()), '')
+    try:
+        entry = json.loads(first)
+    except ValueError:
+        entry = None
+    
+    unconfirmed = {}
+    if isinstance(entry, dict) and 'event' in entry:
+        _, planned, outcomes = RunJournal.replay(path)
+        emails = [spec['email'] for index, spec in sorted(planned.items())
+                  if outcomes.get(index, {}).get('status') == 'created']
+        # Accounts planned without a recorded outcome may exist, but maybe not because of this run
+        unconfirmed = {spec['email']: spec.get('planned_at') for index, spec in sorted(planned.items())
+                       if index not in outcomes}
+    else:
+        emails = [record['email'] for record in read_result_records(path)]
+    
+    seen = set()
+    targets = []
+    for email in emails:
+        if email and '@' in email and email.lower() not in seen:
+            seen.add(email.lower())
+            targets.append(email)
+    unconfirmed = {email: planned_at for email, planned_at in unconfirmed.items() if email.lower() not in seen}
+    return targets, unconfirmed
+
+
+def read_result_records(path: str) -> List[Dict]:
+    """Read the account records of a text, CSV or JSONL results file"""
+    records = []
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        first = next((line for line in f if line.strip()), '')
+        f.seek(0)
+        if first.lstrip().startswith('{'):
+            rows = (json.loads(line) for line in f if line.strip())
+        elif first.lower().startswith('email,'):
+            rows = csv.DictReader(f)
+        else:
+            # Text results: "email | password | first last" rows below the header
+            rows = []
+            for line in f:
+                parts = line.rstrip('\n').split(' | ')
+                if len(parts) != 3 or '@' not in parts[0]:
+                    continue
+                first_name, _, last_name = parts[2].partition(' ')
+                rows.append({'email': parts[0].strip(), 'password': parts[1],
+                             'first_name': first_name, 'last_name': last_name})
+        for row in rows:
+            if row.get('email') and '@' in row['email']:
+                record = {field: row.get(field) or None for field in RESULT_FIELDS}
+                if record['password'] == '-':
+                    record['password'] = None
+                records.append(record)
+    return records
+
+
+class RunJournal:
+    """Append-only JSONL journal of planned accounts and their outcomes"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        torn = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._file = open(path, 'a', encoding='utf-8')
+        if torn:
+            # Terminate a torn final line before appending
+            self._file.write("\n")
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._last_sync = time.monotonic()
+    
+    def record(self, event: str, **fields) -> int:
+        """Append an event and return its sequence number"""
+        line = json.dumps(dict(fields, event=event, ts=time.time()), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._written += 1
+            seq = self._written
+        if time.monotonic() - self._last_sync >= JOURNAL_SYNC_INTERVAL:
+            self.sync()
+        return seq
+    
+    def sync(self, seq: Optional[int] = None):
+        """Make records durable up to seq (group commit across threads)"""
+        with self._sync_lock:
+            if seq is not None and self._synced >= seq:
+                return
+            with self._lock:
+                self._file.flush()
+                target = self._written
+            os.fsync(self._file.fileno())
+            self._synced = target
+            self._last_sync = time.monotonic()
+    
+    def close(self):
+        """Flush, fsync and close the journal"""
+        self.sync()
+        self._file.close()
+    
+    @staticmethod
+    def read_header(path: str) -> Dict:
+        """Read only the run header of a journal, empty when there is none"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('event') == 'run':
+                    entry.pop('event')
+                    entry.pop('ts', None)
+                    return entry
+        return {}
+    
+    @staticmethod
+    def replay(path: str) -> Tuple[Dict, Dict[int, Dict], Dict[int, Dict]]:
+        """Read a journal into its run header, planned specs and outcomes"""
+        header = {}
+        planned = {}
+        outcomes = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash
+                    continue
+                event = entry.pop('event', None)
+                ts = entry.pop('ts', None)
+                if event == 'run':
+                    header = entry
+                elif event == 'planned':
+                    # When the plan was made, an account created before it is not ours
+                    planned[entry['index']] = dict(entry, planned_at=ts)
+                    outcomes.pop(entry['index'], None)
+                elif event in ('created', 'failed'):
+                    outcomes[entry['index']] = dict(entry, status=event)
+        return header, planned, outcomes
+
+
+class ResultsWriter:
+    """Buffered writer streaming result records to disk as they complete"""
+    
+    def __init__(self, path: str, fmt: str, domain: str):
+        self.path = path
+        self.format = fmt
+        self.count = 0
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._file = open(path, 'w', encoding='utf-8', newline='' if fmt == 'csv' else None)
+        
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+            self._csv.writeheader()
+        elif fmt == 'text':
+            self._file.write("=" * 60 + "\n")
+            self._file.write("GOOGLE WORKSPACE BULK EMAIL CREATION RESULTS\n")
+            self._file.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            self._file.write(f"Domain: {domain}\n")
+            self._file.write("=" * 60 + "\n\n")
+            self._file.write("Email | Password | Full Name\n")
+            self._file.write("-" * 60 + "\n")
+    
+    def write(self, record: Dict):
+        """Append a result record, flushing periodically"""
+        with self._lock:
+            if self.format == 'csv':
+                self._csv.writerow(record)
+            elif self.format == 'jsonl':
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                self._file.write(f"{record['email']} | {record['password'] or '-'} | "
+                                 f"{record['first_name']} {record['last_name']}\n")
+            self.count += 1
+            
+            now = time.monotonic()
+            if now - self._last_flush >= RESULTS_FLUSH_INTERVAL:
+                self._file.flush()
+                self._last_flush = now
+    
+    def close(self):
+        """Flush and close the results file"""
+        with self._lock:
+            self._file.close()
+
+
+class WorkQueue:
+    """Durable SQLite queue of planned accounts with lease/ack semantics
+    
+    A coordinator enqueues fully planned accounts; worker processes claim
+    them under a time-limited lease and ack each outcome. Leases that run
+    out (a crashed or stalled worker) go back to the queue, and reclaimed
+    accounts are checked before they are inserted again.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode, transactions are explicit so claims can take the write lock up front
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "idx INTEGER PRIMARY KEY, spec TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', "
+            "owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, user_id TEXT, error TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, lease_expires)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def enqueue(self, domain: str, specs: Iterable[Dict]) -> int:
+        """Append planned accounts, numbered after any already queued"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                queued = self.get_meta('domain')
+                if queued and queued != domain:
+                    raise ValueError(f"Queue {self.path} holds accounts for {queued}, not {domain}")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('domain', ?)", (domain,))
+                offset = self.conn.execute("SELECT COALESCE(MAX(idx), 0) FROM tasks").fetchone()[0]
+                rows = [(offset + n, json.dumps(dict(spec, index=offset + n), ensure_ascii=False))
+                        for n, spec in enumerate(specs, 1)]
+                self.conn.executemany("INSERT INTO tasks (idx, spec) VALUES (?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+    
+    def claim(self, owner: str, limit: int, lease: float = LEASE_SECONDS) -> List[Tuple[Dict, int]]:
+        """Lease up to limit pending or expired accounts; returns (spec, attempts) pairs"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT idx, spec, attempts FROM tasks WHERE state = 'pending' "
+                    "OR (state = 'leased' AND lease_expires < ?) ORDER BY idx LIMIT ?", (now, limit)
+                ).fetchall()
+                self.conn.executemany(
+                    "UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE idx = ?", [(owner, now + lease, idx) for idx, _, _ in rows]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [(json.loads(spec), attempts + 1) for _, spec, attempts in rows]
+    
+    def ack(self, index: int, owner: str, user_id: Optional[str] = None, error: Optional[str] = None) -> bool:
+        """Record an outcome; False when the lease was lost to another worker"""
+        state = 'failed' if error else 'done'
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET state = ?, user_id = ?, error = ?, lease_expires = NULL "
+                "WHERE idx = ? AND owner = ? AND state = 'leased'", (state, user_id, error, index, owner)
+            )
+        return cursor.rowcount == 1
+    
+    def renew(self, owner: str, lease: float = LEASE_SECONDS) -> int:
+        """Extend every lease an owner still holds; returns how many were extended"""
+        with self._lock:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE owner = ? AND state = 'leased'",
+                (time.time() + lease, owner)
+            )
+        return cursor.rowcount
+    
+    def counts(self) -> Dict[str, int]:
+        """Accounts per state, with expired leases counted as pending"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        with self._lock:
+            for state, expired, n in self.conn.execute(
+                    "SELECT state, lease_expires < ?, COUNT(*) FROM tasks GROUP BY state, lease_expires < ?",
+                    (time.time(), time.time())):
+                counts['pending' if state == 'leased' and expired else state] += n
+        return counts
+    
+    def close(self):
+        self.conn.close()
+
+
+class MembershipStage:
+    """Background stage adding created users to groups in batched requests
+    
+    Created accounts are queued as they complete; the stage sends member
+    inserts in batches on its own connection, sharing the manager's rate
+    limit, so group assignment overlaps with account creation.
+    """
+    
+    def __init__(self, manager: 'GoogleWorkspaceManager', batch_size: int = GROUP_BATCH_SIZE):
+        self.manager = manager
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.added = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-members', daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def add(self, email: str, groups: List[str]):
+        """Queue a created user for membership in groups"""
+        for group in groups:
+            self._queue.put((group, email))
+    
+    def close(self) -> Tuple[int, int]:
+        """Send the remaining memberships and return (added, failed)"""
+        self._queue.put(None)
+        self._thread.join()
+        return self.added, self.failed
+    
+    def _run(self):
+        manager = self.manager
+        try:
+            manager._local.service = manager._build_service()
+        except Exception as e:
+            # The main connection is not thread-safe, fail the memberships rather than share it
+            logger.error("Group member stage failed to connect, no members will be added: %s", e)
+            for item in iter(self._queue.get, None):
+                self.failed += 1
+                manager.metrics.add_account('member_failed')
+                logger.error("Failed to add %s to %s: no connection", item[1], item[0])
+            return
+        
+        done = False
+        while not done:
+            item = self._queue.get()
+            if item is None:
+                break
+            pending = [item]
+            # Let a batch fill up while creation is still producing users
+            deadline = time.monotonic() + GROUP_BATCH_WAIT
+            while len(pending) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                pending.append(item)
+            self._send(pending)
+    
+    def _send(self, pending: List[Tuple[str, str]]):
+        manager = self.manager
+        
+        def callback(request_id, response, exception):
+            group, email = pending[int(request_id)]
+            if exception is None or is_member_exists_error(exception):
+                self.added += 1
+                manager.metrics.add_account('member_added')
+                logger.info("Added %s to %s", email, group)
+            else:
+                self.failed += 1
+                manager.metrics.add_account('member_failed')
+                logger.error("Failed to add %s to %s: %s", email, group, exception)
+        
+        try:
+            requests = {
+                str(i): manager.service.members().insert(groupKey=group, body={'email': email, 'role': 'MEMBER'})
+                for i, (group, email) in enumerate(pending)
+            }
+            manager._execute_batch(requests, callback)
+        except Exception as e:
+            self.failed += len(pending)
+            logger.error("Failed to add %d group members: %s", len(pending), e)
+
 
 class GoogleWorkspaceManager:
     """Main class for managing Google Workspace operations"""
     
-    def __init__(self):
-        self.service = None
+    def __init__(self, options: Optional[argparse.Namespace] = None):
+        self.options = options or parse_args([])
+        self.credentials = None
+        self._service = None
+        self._local = threading.local()  # Per-worker service instances
+        self._pooled_http = None  # Shared transport when --transport requests
+        self._index_lock = threading.Lock()
+        self.rate_controller = RateController(self.options.rate, self.options.max_rate)
+        self.metrics = Metrics()
         self.environment = self._detect_environment()
         self.domain = None
         self.password = None
         self.first_names = []
         self.last_names = []
+        self.planner = None
+        self.existing_emails = None  # Set of known addresses once prefetched
+        self.reserved_emails = set()  # Addresses handed out during this run
+        self.suffix_floor = {}  # Highest suffix known taken, per base address
+        self.planned = {}  # Account specs decided before creation, by index
+        self.cache = None
+        self.journal = None
+        self.first_insert_after = None  # Seconds from launch to the first insert
+        self.import_file = self.options.import_file  # Roster to create instead of generated names
+        self.skipped = 0  # Import rows rejected as invalid or duplicate
+        self.unresolved = []  # In-flight accounts a resume could not check
+        self.credentials_manager = None
+        self.scopes = list(SCOPES)
+        self.memberships = None  # Group member stage when groups are assigned
+        self.passwords = None  # Per-user password stage with --random-passwords
+        self.domains = []  # (domain, count or None) from domain.txt
+        self.file_suffix = ''  # Tags output files when several domains run at once
+        self.progress_label = None
+        self.cache_shared = False  # Cache connection owned by the multi-domain parent
+    
+    @property
+    def service(self):
+        """Directory API service for the calling thread"""
+        return getattr(self._local, 'service', None) or self._service
+    
+    @service.setter
+    def service(self, value):
+        self._service = value
+    
+    def _connect_thread(self):
+        """Give the calling thread its own API connection"""
+        self._local.service = self._build_service()
+    
+    def _execute(self, request) -> Dict:
+        """Execute an API request under rate control, retrying throttled calls"""
+        operation = _operation_name(request)
+        attempt = 0
+        while True:
+            self.metrics.add_blocked('rate_limit', self.rate_controller.acquire())
+            started = time.monotonic()
+            try:
+                response = request.execute()
+            except Exception as e:
+                self.metrics.observe(operation, time.monotonic() - started, _http_status(e) or 'error')
+                if not is_throttle_error(e) or attempt >= self.options.max_retries:
+                    # An earlier attempt may have been applied before the error came back
+                    e.retried = attempt > 0
+                    raise
+                retry_after = retry_after_seconds(e)
+                self.rate_controller.on_throttle(retry_after)
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning("Throttled (HTTP %s), retrying in %.1fs", _http_status(e), delay)
+                time.sleep(delay)
+                self.metrics.add_blocked('backoff', delay)
+                attempt += 1
+                continue
+            self._local.last_latency = time.monotonic() - started
+            self.rate_controller.on_success()
+            self.metrics.observe(operation, self._local.last_latency, 200)
+            self.metrics.set_gauge('rate_limit_calls_per_second', self.rate_controller.rate)
+            return response
+    
+    def _execute_batch(self, requests: Dict[str, object], callback):
+        """Execute requests in one batch HTTP call, retrying throttled items"""
+        pending = dict(requests)
+        attempt = 0
+        
+        while pending:
+            throttled = {}
+            seen = set()
+            successes = 0
+            retry_after = None
+            can_retry = attempt < self.options.max_retries
+            
+            def on_response(request_id, response, exception):
+                nonlocal successes, retry_after
+                seen.add(request_id)
+                self.metrics.count(_operation_name(pending[request_id]),
+                                   200 if exception is None else (_http_status(exception) or 'error'))
+                if exception is not None and can_retry and is_throttle_error(exception):
+                    throttled[request_id] = pending[request_id]
+                    retry_after = max(retry_after or 0.0, retry_after_seconds(exception) or 0.0)
+                    return
+                if exception is None:
+                    successes += 1
+                else:
+                    exception.retried = attempt > 0
+                self._local.last_latency = time.monotonic() - started
+                callback(request_id, response, exception)
+            
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for request_id, request in pending.items():
+                batch.add(request, request_id=request_id)
+            
+            self.metrics.add_blocked('rate_limit', self.rate_controller.acquire(len(pending)))
+            started = time.monotonic()
+            try:
+                batch.execute()
+                self.metrics.observe('batch', time.monotonic() - started, 200)
+            except Exception as e:
+                self.metrics.observe('batch', time.monotonic() - started, _http_status(e) or 'error')
+                unresolved = {rid: req for rid, req in pending.items() if rid not in seen}
+                if can_retry and is_throttle_error(e):
+                    throttled.update(unresolved)
+                else:
+                    logger.error("Batch request failed: %s", e)
+                    e.retried = attempt > 0
+                    for request_id in unresolved:
+                        callback(request_id, None, e)
+            
+            if successes:
+                self.rate_controller.on_success(successes)
+            self.metrics.set_gauge('rate_limit_calls_per_second', self.rate_controller.rate)
+            if throttled:
+                self.rate_controller.on_throttle(retry_after)
+                delay = backoff_delay(attempt, retry_after)
+                logger.warning("%d batched calls throttled, retrying in %.1fs", len(throttled), delay)
+                time.sleep(delay)
+                self.metrics.add_blocked('backoff', delay)
+            pending = throttled
+            attempt += 1
+    
+    def _build_service(self):
+        """Build a Directory API service on its own authorized HTTP transport"""
+        from googleapiclient.discovery import build_from_document
+        
+        if self.options.transport == 'requests':
+            with self._index_lock:
+                if self._pooled_http is None:
+                    pool_size = self.options.pool_size or max(self.options.workers, 10)
+                    self._pooled_http = PooledHttp(self.credentials, pool_size, self.options.timeout)
+            http = self._pooled_http
+        else:
+            import google_auth_httplib2
+            import httplib2
+            
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials,
+                                                       http=httplib2.Http(timeout=self.options.timeout))
+        return build_from_document(_discovery_document(self.options.api_endpoint), http=http)
         
     def _detect_environment(self) -> str:
         """Detect if running in VPS or local environment"""
@@ -54,7 +1655,8 @@ class GoogleWorkspaceManager:
     
     def display_header(self):
         """Display application header"""
-        os.system('clear' if os.name == 'posix' else 'cls')
+        if sys.stdout.isatty():
+            os.system('clear' if os.name == 'posix' else 'cls')
         print("=" * 60)
         print("GOOGLE WORKSPACE BULK EMAIL CREATOR")
         print(f"Environment: {self.environment.upper()}")
@@ -66,16 +1668,21 @@ class GoogleWorkspaceManager:
         required_packages = {
             'google-auth': 'google.auth',
             'google-auth-oauthlib': 'google_auth_oauthlib',
-            'google-auth-httplib2': 'google.auth.transport',
+            'google-auth-httplib2': 'google_auth_httplib2',
             'google-api-python-client': 'googleapiclient',
             'requests': 'requests'
         }
+        if self.options.async_inflight:
+            required_packages['aiohttp'] = 'aiohttp'
         
+        # Locate modules without importing them, they load when first used
         missing_packages = []
         for package, module in required_packages.items():
             try:
-                __import__(module)
+                found = importlib.util.find_spec(module) is not None
             except ImportError:
+                found = False
+            if not found:
                 missing_packages.append(package)
         
         if missing_packages:
@@ -120,12 +1727,21 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
     def load_configuration(self) -> bool:
         """Load configuration from files"""
         try:
-            # Load domain
+            # Load domains, one per line with an optional account count
+            self.domains = []
             if os.path.exists(DOMAIN_FILE):
                 with open(DOMAIN_FILE, 'r') as f:
-                    self.domain = f.read().strip() or "example.com"
-            else:
-                self.domain = "example.com"
+                    for line in f:
+                        parts = line.split('#', 1)[0].split()
+                        if not parts:
+                            continue
+                        count = int(parts[1]) if len(parts) > 1 else None
+                        if count is not None and count <= 0:
+                            raise ValueError(f"Account count for {parts[0]} must be positive")
+                        self.domains.append((parts[0], count))
+            if not self.domains:
+                self.domains = [("example.com", None)]
+            self.domain = self.domains[0][0]
             
             # Load password
             if os.path.exists(PASSWORD_FILE):
@@ -135,20 +1751,7 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
                 self.password = "Email123@"
             
             # Load names
-            self.first_names = []
-            self.last_names = []
-            
-            if os.path.exists(NAME_FILE):
-                with open(NAME_FILE, 'r') as f:
-                    for line in f:
-                        line = line.strip()
-                        if line and not line.startswith('#'):
-                            parts = line.split()
-                            if len(parts) > 1:
-                                if parts[0].upper() == 'DEPAN':
-                                    self.first_names.extend(parts[1:])
-                                elif parts[0].upper() == 'BELAKANG':
-                                    self.last_names.extend(parts[1:])
+            self.first_names, self.last_names = load_names(NAME_FILE)
             
             # Use defaults if empty
             if not self.first_names:
@@ -156,6 +1759,8 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             if not self.last_names:
                 self.last_names = ['One', 'Two', 'Three']
             
+            self.planner = NamePlanner(self.first_names, self.last_names)
+            
             logger.info("Configuration loaded successfully")
             return True
             
@@ -194,7 +1799,7 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             'response_type': 'code',
             'client_id': client_info['client_id'],
             'redirect_uri': 'http://localhost:8080',
-            'scope': ' '.join(SCOPES),
+            'scope': ' '.join(self.scopes),
             'state': state,
             'access_type': 'offline',
             'prompt': 'consent'
@@ -318,7 +1923,7 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             'response_type': 'code',
             'client_id': client_info['client_id'],
             'redirect_uri': f'http://localhost:{PORT}',
-            'scope': ' '.join(SCOPES),
+            'scope': ' '.join(self.scopes),
             'state': state,
             'access_type': 'offline',
             'prompt': 'consent'
@@ -414,152 +2019,1373 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             logger.info("Credentials created successfully")
             return True
     
-    def _exchange_code_for_token(self, client_info: Dict, auth_code: str) -> bool:
-        """Exchange authorization code for access token"""
-        import requests
+    def _exchange_code_for_token(self, client_info: Dict, auth_code: str) -> bool:
+        """Exchange authorization code for access token"""
+        import requests
+        
+        logger.info("Exchanging authorization code for access token")
+        
+        token_data = {
+            'code': auth_code,
+            'client_id': client_info['client_id'],
+            'client_secret': client_info['client_secret'],
+            'redirect_uri': 'http://localhost:8080',
+            'grant_type': 'authorization_code'
+        }
+        
+        try:
+            response = requests.post(client_info['token_uri'], data=token_data, timeout=HTTP_TIMEOUT)
+            response.raise_for_status()
+            token_info = response.json()
+            
+            if 'error' in token_info:
+                logger.error("Token error: %s", token_info.get('error_description', token_info['error']))
+                return False
+            
+            # Save token
+            expiry = datetime.utcnow() + timedelta(seconds=token_info.get('expires_in', 3600))
+            
+            token_json = {
+                "token": token_info['access_token'],
+                "refresh_token": token_info.get('refresh_token'),
+                "token_uri": client_info['token_uri'],
+                "client_id": client_info['client_id'],
+                "client_secret": client_info['client_secret'],
+                "scopes": self.scopes,
+                "expiry": expiry.isoformat() + "Z"
+            }
+            
+            write_file_atomic(TOKEN_FILE, json.dumps(token_json, indent=2))
+            
+            logger.info("Access token saved successfully")
+            return True
+            
+        except Exception as e:
+            logger.error("Failed to exchange code for token: %s", e)
+            return False
+    
+    def authenticate(self) -> Optional[object]:
+        """Authenticate with Google Workspace"""
+        from google.oauth2.credentials import Credentials
+        from google.auth.transport.requests import Request
+        
+        creds = None
+        
+        if os.path.exists(TOKEN_FILE):
+            try:
+                creds = Credentials.from_authorized_user_file(TOKEN_FILE)
+            except Exception as e:
+                logger.error("Failed to load token: %s", e)
+            if creds and not creds.has_scopes(self.scopes):
+                logger.info("Token lacks required scopes, authorization required")
+                creds = None
+        
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                try:
+                    started = time.monotonic()
+                    creds.refresh(Request())
+                    self.metrics.observe('token_refresh', time.monotonic() - started, 200)
+                    write_file_atomic(TOKEN_FILE, creds.to_json())
+                    logger.info("Token refreshed successfully")
+                except Exception as e:
+                    logger.error("Token refresh failed: %s", e)
+                    if self.setup_oauth():
+                        return self.authenticate()
+                    return None
+            else:
+                logger.info("Authentication required")
+                if self.setup_oauth():
+                    return self.authenticate()
+                return None
+        
+        return creds
+    
+    def _open_cache(self):
+        """Open the on-disk directory cache unless disabled"""
+        if self.options.cache_file and self.cache is None:
+            try:
+                self.cache = DirectoryCache(self.options.cache_file)
+            except sqlite3.Error as e:
+                logger.warning("Failed to open directory cache %s: %s", self.options.cache_file, e)
+    
+    def _start_stages(self):
+        """Start the background stages that run alongside creation"""
+        # Per-user passwords are generated and hashed ahead of creation
+        if self.options.random_passwords:
+            self.passwords = PasswordStage(self.options.password_length, self.options.hash_function)
+            self.passwords.start()
+        
+        # Group memberships are added behind creation as accounts complete
+        if self._groups_enabled():
+            self.memberships = MembershipStage(self)
+            self.memberships.start()
+    
+    def close(self) -> Tuple[int, int]:
+        """Finish background stages and release connections; returns (members added, members failed)"""
+        members = (0, 0)
+        if self.memberships:
+            print("\nFinishing group memberships...")
+            members = self.memberships.close()
+            self.memberships = None
+        if self.passwords:
+            self.passwords.close()
+            self.passwords = None
+        self._release_cache()
+        if self.credentials_manager:
+            self.credentials_manager.stop()
+            self.credentials_manager = None
+        if self._pooled_http:
+            self._pooled_http.close()
+            self._pooled_http = None
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+        return members
+    
+    def _release_cache(self):
+        """Close the directory cache, or only drop it when another manager owns it"""
+        if self.cache and not self.cache_shared:
+            self.cache.close()
+        self.cache = None
+    
+    def load_directory_index(self) -> bool:
+        """Load known addresses from the local cache, re-syncing it when stale"""
+        self._open_cache()
+        
+        if self.cache and self.cache.is_fresh(self.domain, self.options.cache_max_age):
+            self.existing_emails = self.cache.emails(self.domain)
+            logger.info("Directory index loaded from cache: %d known addresses", len(self.existing_emails))
+            return True
+        
+        return self.sync_directory_index()
+    
+    def sync_directory_index(self) -> bool:
+        """Prefetch existing primary emails and aliases for the domain"""
+        existing = set()
+        entries = []
+        page_token = None
+        
+        try:
+            while True:
+                response = self._execute(self.service.users().list(
+                    domain=self.domain,
+                    maxResults=LIST_PAGE_SIZE,
+                    pageToken=page_token,
+                    fields='nextPageToken,users(id,primaryEmail,aliases,nonEditableAliases)'
+                ))
+                
+                for user in response.get('users', []):
+                    user_id = user.get('id')
+                    for address in ([user['primaryEmail']] + user.get('aliases', [])
+                                    + user.get('nonEditableAliases', [])):
+                        existing.add(address.lower())
+                        entries.append((address, user_id))
+                
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            logger.warning("Failed to prefetch directory, falling back to per-address lookups: %s", e)
+            return False
+        
+        if self.cache:
+            self.cache.replace_domain(self.domain, entries)
+        
+        self.existing_emails = existing
+        logger.info("Directory index loaded: %d known addresses", len(existing))
+        return True
+    
+    def _remember_email(self, email: str, user_id: Optional[str] = None):
+        """Add an address taken in the directory to the index and cache"""
+        if self.existing_emails is not None:
+            with self._index_lock:
+                self.existing_emails.add(email.lower())
+        if self.cache:
+            self.cache.add(email, self.domain, user_id)
+    
+    def _email_exists(self, email: str) -> bool:
+        """Check whether an address is already taken"""
+        if self.existing_emails is not None:
+            return email.lower() in self.existing_emails
+        if self.options.optimistic:
+            # Let the insert itself detect conflicts
+            return False
+        try:
+            self._execute(self.service.users().get(userKey=email))
+            return True
+        except Exception as e:
+            # Only a 404 says the address is free, a failed probe must not
+            if _http_status(e) == 404:
+                return False
+            raise
+    
+    def _reserve_email(self, email: str) -> bool:
+        """Atomically claim an address for this run"""
+        key = email.lower()
+        with self._index_lock:
+            if key in self.reserved_emails:
+                return False
+            if self.existing_emails is not None and key in self.existing_emails:
+                return False
+            self.reserved_emails.add(key)
+            return True
+    
+    def generate_unique_email(self, first_name: str, last_name: str) -> str:
+        """Generate unique email address"""
+        counter = self.suffix_floor.get(base_address(first_name, last_name), -1) + 1
+        email = format_address(first_name, last_name, counter, self.domain)
+        
+        while self._email_exists(email) or not self._reserve_email(email):
+            # Email exists or is reserved, try with number
+            counter += 1
+            email = format_address(first_name, last_name, counter, self.domain)
+        
+        return email
+    
+    def _next_planned_address(self) -> Tuple[str, str, str]:
+        """Take the next free address from the name planner"""
+        while True:
+            first_name, last_name, suffix = self.planner.next()
+            if suffix <= self.suffix_floor.get(base_address(first_name, last_name), -1):
+                continue
+            email = format_address(first_name, last_name, suffix, self.domain)
+            if not self._email_exists(email) and self._reserve_email(email):
+                return first_name, last_name, email
+    
+    def _mark_first_insert(self):
+        """Record how long it took from launch to the first insert"""
+        if self.first_insert_after is None:
+            self.first_insert_after = time.monotonic() - LAUNCH_TIME
+            logger.info("First insert %.2fs after launch", self.first_insert_after)
+    
+    def _plan_account(self, index: int) -> Dict:
+        """Decide name and address for an account and journal the plan"""
+        spec = self.planned.pop(index, None)
+        if spec is None:
+            spec = self._new_spec(index)
+        return self._journal_plan(spec)
+    
+    def _plan_or_fail(self, index: int, total: int) -> Optional[Dict]:
+        """Plan an account, reporting it as failed when its address cannot be checked"""
+        try:
+            return self._plan_account(index)
+        except Exception as e:
+            self.metrics.add_account('failed')
+            logger.error("[%d/%d] Failed to plan an address: %s", index, total, e,
+                         extra={'event': 'failed', 'index': index, 'status': _http_status(e)})
+            return None
+    
+    def _journal_plan(self, spec: Dict) -> Dict:
+        """Record an account plan in the journal"""
+        if self.journal:
+            # Passwords stay out of the journal, only the results file holds them
+            spec['seq'] = self.journal.record('planned', **{k: v for k, v in spec.items()
+                                                             if k not in ('seq', 'planned_at', 'password',
+                                                                          'password_hash')})
+        return spec
+    
+    def _replan_conflict(self, spec: Dict) -> Dict:
+        """Move an account whose address was taken to the next free suffix"""
+        first_name, last_name = spec['first_name'], spec['last_name']
+        base = base_address(first_name, last_name)
+        self._remember_email(spec['email'])
+        self.metrics.add_account('conflict')
+        
+        with self._index_lock:
+            taken = address_suffix(spec['email'], first_name, last_name)
+            self.suffix_floor[base] = max(self.suffix_floor.get(base, -1), taken)
+        
+        email = self.generate_unique_email(first_name, last_name)
+        logger.info("[%d] %s already exists, trying %s", spec['index'], spec['email'], email)
+        return self._journal_plan(dict(spec, email=email))
+    
+    def _find_own_account(self, spec: Dict) -> Optional[Dict]:
+        """Look up an address whose retried insert hit a conflict; the user if it is ours"""
+        try:
+            user = self._execute(self.service.users().get(userKey=spec['email']))
+        except Exception as e:
+            if _http_status(e) == 404:
+                return None
+            raise
+        return user if is_same_person(user, spec) else None
+    
+    def _resolve_conflict(self, spec: Dict, error: Exception, conflicts: int) -> Tuple[str, Optional[Dict]]:
+        """Decide how to go on after a failed insert: ('accept', user), ('retry', new spec) or ('fail', None)"""
+        if not is_conflict_error(error):
+            return 'fail', None
+        try:
+            if getattr(error, 'retried', False):
+                # Insert is not idempotent, the first attempt may have gone through
+                user = self._find_own_account(spec)
+                if user:
+                    return 'accept', user
+            if spec.get('fixed') or conflicts >= MAX_CONFLICT_RETRIES:
+                return 'fail', None
+            # Taken since the index was loaded (or never probed), move to the next suffix
+            return 'retry', self._replan_conflict(spec)
+        except Exception as e:
+            # Without a definite answer the account may exist, retrying could duplicate it
+            logger.warning("[%d] Could not resolve the conflict on %s: %s", spec['index'], spec['email'], e)
+            return 'fail', None
+    
+    def _new_spec(self, index: int) -> Dict:
+        """Build a fresh account spec from the next planned address"""
+        first_name, last_name, email = self._next_planned_address()
+        return {
+            'index': index,
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': email
+        }
+    
+    def _import_spec(self, index: int, row: Optional[Dict]) -> Optional[Dict]:
+        """Validate an import row and resolve its address, None to skip it"""
+        if row is None:
+            logger.warning("Import row %d: unreadable, skipped", index)
+            return None
+        try:
+            spec = normalize_import_row(row)
+        except ValueError as e:
+            logger.warning("Import row %d: %s, skipped", index, e)
+            return None
+        if 'first_name' not in spec or 'last_name' not in spec:
+            logger.warning("Import row %d: first and last name are required, skipped", index)
+            return None
+        
+        email = spec.get('email')
+        try:
+            if email is None:
+                spec['email'] = self.generate_unique_email(spec['first_name'], spec['last_name'])
+            elif email.count('@') != 1 or email.split('@')[1].lower() != self.domain.lower():
+                logger.warning("Import row %d: %s is not an address in %s, skipped", index, email, self.domain)
+                return None
+            elif self._email_exists(email) or not self._reserve_email(email):
+                logger.warning("Import row %d: %s already exists, skipped", index, email)
+                return None
+            else:
+                # Addresses from the file are kept as given, never moved on conflict
+                spec['fixed'] = True
+        except Exception as e:
+            logger.warning("Import row %d: could not check the address: %s, skipped", index, e)
+            return None
+        return dict(spec, index=index)
+    
+    def stream_import(self, path: str, skip: int = 0) -> Iterator[int]:
+        """Validate and dedupe import rows as they are read, yielding planned indices"""
+        for index, row in enumerate(read_import_rows(path), 1):
+            if index <= skip:
+                continue
+            spec = self._import_spec(index, row)
+            if spec is None:
+                self.skipped += 1
+                self.metrics.add_account('skipped')
+                continue
+            self.planned[index] = spec
+            yield index
+    
+    def plan_accounts(self, indices: List[int]):
+        """Resolve addresses for all indices up front, before any insert"""
+        for index in indices:
+            if index not in self.planned:
+                self.planned[index] = self._new_spec(index)
+    
+    def _groups_enabled(self) -> bool:
+        """Whether created users are added to groups"""
+        if self.options.groups:
+            return True
+        return bool(self.import_file and os.path.exists(self.import_file)
+                    and 'groups' in import_columns(self.import_file))
+    
+    def _build_user_body(self, spec: Dict) -> Dict:
+        """Build users.insert request body"""
+        body = {
+            "name": {
+                "givenName": spec['first_name'],
+                "familyName": spec['last_name']
+            },
+            "password": spec.get('password') or self.password,
+            "primaryEmail": spec['email'],
+            "changePasswordAtNextLogin": False
+        }
+        if self.passwords and not spec.get('password'):
+            spec['password'], spec['password_hash'] = self.passwords.take()
+        if spec.get('password_hash'):
+            body["password"] = spec['password_hash']
+            body["hashFunction"] = self.options.hash_function
+        org_unit = spec.get('org_unit') or self.options.org_unit
+        if org_unit:
+            body["orgUnitPath"] = org_unit
+        return body
+    
+    def _result_record(self, spec: Dict, response: Optional[Dict] = None,
+                       latency: Optional[float] = None) -> Dict:
+        """Build the result record of a created account"""
+        response = response or {}
+        return {
+            'email': spec['email'],
+            # Random passwords of accounts resumed from a journal were never stored
+            'password': spec.get('password') or (None if self.options.random_passwords else self.password),
+            'first_name': spec['first_name'],
+            'last_name': spec['last_name'],
+            'id': response.get('id'),
+            'creation_time': response.get('creationTime'),
+            'latency_ms': round(latency * 1000) if latency is not None else None
+        }
+    
+    def _record_success(self, spec: Dict, total: int, response: Optional[Dict] = None,
+                        latency: Optional[float] = None) -> Dict:
+        """Report a created account and return its result record"""
+        index, email = spec['index'], spec['email']
+        user_id = (response or {}).get('id')
+        self._remember_email(email, user_id)
+        if self.journal:
+            self.journal.record('created', index=index, email=email, id=user_id)
+        self.metrics.add_account('created')
+        if self.memberships:
+            self.memberships.add(email, (self.options.groups or []) + spec.get('groups', []))
+        logger.info("[%d/%d] Created: %s", index, total, email,
+                    extra={'event': 'created', 'index': index, 'email': email, 'user_id': user_id})
+        return self._result_record(spec, response, latency)
+    
+    def _record_failure(self, spec: Dict, total: int, error: object):
+        """Report a failed account creation"""
+        index, email = spec['index'], spec['email']
+        error_msg = str(error)
+        if self.journal:
+            self.journal.record('failed', index=index, email=email, error=error_msg)
+        self.metrics.add_account('failed')
+        if 'Entity already exists' in error_msg:
+            # Taken since the index was loaded, remember it for later runs
+            self._remember_email(email)
+        fields = {'event': 'failed', 'index': index, 'email': email, 'status': _http_status(error)}
+        if 'quotaExceeded' in error_msg:
+            logger.warning("[%d/%d] Quota exceeded for %s", index, total, email, extra=fields)
+        else:
+            logger.error("[%d/%d] Failed to create %s: %s", index, total, email, error_msg, extra=fields)
+    
+    def create_user(self, index: int, total: int) -> Optional[Dict]:
+        """Create single user account"""
+        spec = self._plan_or_fail(index, total)
+        if spec is None:
+            return None
+        conflicts = 0
+        
+        while True:
+            if self.journal:
+                # The plan must be durable before the account can exist
+                self.journal.sync(spec['seq'])
+            
+            self._mark_first_insert()
+            try:
+                user_data = self._build_user_body(spec)
+                response = self._execute(self.service.users().insert(body=user_data))
+                return self._record_success(spec, total, response, self._local.last_latency)
+            except Exception as e:
+                action, value = self._resolve_conflict(spec, e, conflicts)
+                if action == 'accept':
+                    return self._record_success(spec, total, value)
+                if action == 'retry':
+                    spec = value
+                    conflicts += 1
+                    continue
+                self._record_failure(spec, total, e)
+                return None
+    
+    def create_users_batch(self, indices: List[int], total: int) -> Dict[int, Optional[Dict]]:
+        """Create several user accounts in a single batch HTTP request"""
+        specs = {}
+        for index in indices:
+            spec = self._plan_or_fail(index, total)
+            if spec is not None:
+                specs[index] = spec
+        
+        results = {index: None for index in indices}
+        conflicts = {index: 0 for index in indices}
+        check = {}
+        
+        def callback(request_id, response, exception):
+            spec = specs[int(request_id)]
+            if exception is None:
+                results[spec['index']] = self._record_success(spec, total, response,
+                                                              self._local.last_latency)
+            elif is_conflict_error(exception):
+                # Resolved after the batch, lookups cannot be sent from inside it
+                check[spec['index']] = exception
+            else:
+                self._record_failure(spec, total, exception)
+        
+        pending = list(specs)
+        while pending:
+            requests = {}
+            for index in pending:
+                try:
+                    body = self._build_user_body(specs[index])
+                except Exception as e:
+                    self._record_failure(specs[index], total, e)
+                    continue
+                requests[str(index)] = self.service.users().insert(body=body)
+            
+            if self.journal:
+                self.journal.sync(max(specs[index]['seq'] for index in pending))
+            
+            self._mark_first_insert()
+            if requests:
+                self._execute_batch(requests, callback)
+            
+            # Conflicting addresses move to their next suffix and go out again
+            pending = []
+            for index, exception in check.items():
+                action, value = self._resolve_conflict(specs[index], exception, conflicts[index])
+                if action == 'accept':
+                    results[index] = self._record_success(specs[index], total, value)
+                elif action == 'retry':
+                    specs[index] = value
+                    conflicts[index] += 1
+                    pending.append(index)
+                else:
+                    self._record_failure(specs[index], total, exception)
+            check.clear()
+        
+        return results
+    
+    def _create_sequential(self, indices: Iterable[int], total: int) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Create accounts one request at a time"""
+        for i in indices:
+            yield i, self.create_user(i, total)
+    
+    def _chunks(self, indices: Iterable[int]) -> Iterator[List[int]]:
+        """Split indices into groups of batch_size as they arrive"""
+        size = max(1, min(self.options.batch_size, MAX_BATCH_SIZE))
+        indices = iter(indices)
+        while True:
+            chunk = list(islice(indices, size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _create_batched(self, indices: Iterable[int], total: int) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Create accounts in groups of batch_size inserts per HTTP request"""
+        for chunk in self._chunks(indices):
+            results = self.create_users_batch(chunk, total)
+            for i in chunk:
+                yield i, results[i]
+    
+    def _create_concurrent(self, indices: Iterable[int], total: int) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Create accounts from a shared work queue using a pool of workers"""
+        # Bounded so that streamed input is only read as fast as workers consume it
+        work = queue.Queue(maxsize=self.options.workers * 2)
+        completed = queue.Queue()
+        
+        def feeder():
+            try:
+                for chunk in self._chunks(indices):
+                    work.put(chunk)
+            except Exception as e:
+                logger.error("Failed to read work: %s", e)
+            finally:
+                work.put(None)
+        
+        def worker(worker_id: int):
+            try:
+                try:
+                    self._local.service = self._build_service()
+                except Exception as e:
+                    logger.error("Worker %d failed to connect: %s", worker_id, e)
+                    return
+                
+                while True:
+                    chunk = work.get()
+                    if chunk is None:
+                        # Leave the end marker for the other workers
+                        work.put(None)
+                        return
+                    
+                    if len(chunk) > 1:
+                        results = self.create_users_batch(chunk, total)
+                    else:
+                        results = {chunk[0]: self.create_user(chunk[0], total)}
+                    for i in chunk:
+                        completed.put((i, results[i]))
+            finally:
+                completed.put(None)
+        
+        threading.Thread(target=feeder, name="feeder", daemon=True).start()
+        workers = [
+            threading.Thread(target=worker, args=(n,), name=f"worker-{n}", daemon=True)
+            for n in range(1, self.options.workers + 1)
+        ]
+        for thread in workers:
+            thread.start()
+        
+        stopped = 0
+        while stopped < len(workers):
+            item = completed.get()
+            if item is None:
+                stopped += 1
+                continue
+            yield item
+        
+        # Every worker has exited, anything still queued will not complete
+        stranded = 0
+        while True:
+            chunk = work.get()
+            if chunk is None:
+                break
+            for i in chunk:
+                stranded += 1
+                yield i, None
+        if stranded:
+            logger.error("All workers stopped with %d accounts remaining", stranded)
+    
+    def plan_run(self, count: int) -> Optional[Dict]:
+        """Resolve every address against a directory snapshot and write the plan, without creating anything"""
+        print("Loading directory index...")
+        if not self.load_directory_index():
+            logger.error("Planning needs a directory snapshot, users.list failed")
+            return None
+        
+        indices = list(range(1, count + 1))
+        self.plan_accounts(indices)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = self.options.plan.replace('{timestamp}', timestamp)
+        if not path.lower().endswith(('.jsonl', '.ndjson')):
+            path += '.jsonl'
+        lines = []
+        for index in indices:
+            spec = self.planned[index]
+            lines.append(json.dumps({'first_name': spec['first_name'], 'last_name': spec['last_name'],
+                                     'email': spec['email']}, ensure_ascii=False) + "\n")
+        write_file_atomic(path, "".join(lines))
+        
+        # Round trip of a read call, measured on the first planned address
+        operations = self.metrics.summary()['operations']
+        latency = (operations.get('users.list') or {}).get('p50_seconds')
+        if latency is None:
+            started = time.monotonic()
+            try:
+                self._execute(self.service.users().get(userKey=self.planned[1]['email']))
+            except Exception:
+                pass
+            latency = time.monotonic() - started
+        
+        estimate = estimate_duration(count, self.options.rate, self.options.max_rate,
+                                     self.options.batch_size, self.options.workers, latency)
+        logger.info("Planned %d accounts to %s, estimated %.0fs", count, path, estimate['total_seconds'])
+        
+        self.close()
+        
+        return {
+            'count': count,
+            'plan_file': path,
+            'known_addresses': len(self.existing_emails),
+            'latency_seconds': round(latency, 3),
+            'estimate': estimate
+        }
+    
+    def display_plan(self, plan: Dict):
+        """Display a dry-run plan and its duration estimate"""
+        estimate = plan['estimate']
+        print("\n" + "=" * 60)
+        print("PLAN (dry run, nothing was created)")
+        print("=" * 60)
+        print(f"  Accounts: {plan['count']}")
+        print(f"  Existing addresses in snapshot: {plan['known_addresses']}")
+        print(f"  Plan file: {plan['plan_file']}")
+        print(f"  Estimated duration: {timedelta(seconds=int(estimate['total_seconds']))}")
+        print(f"    rate limit wait: {estimate['quota_seconds']:.0f}s from {self.options.rate:g} up to {self.options.max_rate:g} calls/s")
+        print(f"    round trips: {estimate['latency_seconds']:.0f}s at {plan['latency_seconds'] * 1000:.0f}ms "
+              f"per request, batch size {self.options.batch_size}, {self.options.workers} worker(s)")
+        print(f"  Create it with: python bot.py --import {plan['plan_file']}")
+        print("=" * 60)
+    
+    def rollback_accounts(self, path: str, action: str) -> Optional[Dict]:
+        """Delete or suspend every account listed in a results file or journal"""
+        try:
+            targets, unconfirmed = read_rollback_targets(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Failed to read %s: %s", path, e)
+            return None
         
-        logger.info("Exchanging authorization code for access token")
+        skipped = []
+        if unconfirmed:
+            # Only touch in-flight accounts that were created after this run planned them
+            print(f"Checking {len(unconfirmed)} accounts that were in flight when the run stopped...")
+            found, missing, _ = self._get_for_verify(list(unconfirmed))
+            for email in unconfirmed:
+                if email in missing:
+                    continue
+                if email in found and created_since(found[email], unconfirmed[email]):
+                    targets.append(email)
+                else:
+                    skipped.append(email)
+                    logger.warning("Skipping %s, it was not confirmed as created by this run", email)
         
-        token_data = {
-            'code': auth_code,
-            'client_id': client_info['client_id'],
-            'client_secret': client_info['client_secret'],
-            'redirect_uri': 'http://localhost:8080',
-            'grant_type': 'authorization_code'
-        }
+        if action == 'delete':
+            self._open_cache()
         
-        try:
-            response = requests.post(client_info['token_uri'], data=token_data)
-            response.raise_for_status()
-            token_info = response.json()
-            
-            if 'error' in token_info:
-                logger.error("Token error: %s", token_info.get('error_description', token_info['error']))
-                return False
+        size = self.options.batch_size if self.options.batch_size > 1 else ROLLBACK_BATCH_SIZE
+        size = min(size, MAX_BATCH_SIZE)
+        verb = 'Deleted' if action == 'delete' else 'Suspended'
+        print(f"\n{'Deleting' if action == 'delete' else 'Suspending'} {len(targets)} accounts from {path}...")
+        print("-" * 60)
+        
+        done = 0
+        failed = []
+        start_time = time.time()
+        
+        for start in range(0, len(targets), size):
+            chunk = targets[start:start + size]
+            requests = {}
+            for i, email in enumerate(chunk, start + 1):
+                if action == 'delete':
+                    requests[str(i)] = self.service.users().delete(userKey=email)
+                else:
+                    requests[str(i)] = self.service.users().update(userKey=email, body={'suspended': True})
             
-            # Save token
-            expiry = datetime.utcnow() + timedelta(seconds=token_info.get('expires_in', 3600))
+            def callback(request_id, response, exception):
+                nonlocal done
+                index = int(request_id)
+                email = targets[index - 1]
+                if exception is not None and _http_status(exception) != 404:
+                    failed.append(email)
+                    self.metrics.add_account('rollback_failed')
+                    logger.error("[%d/%d] Failed to roll back %s: %s", index, len(targets), email, exception)
+                    return
+                if exception is not None:
+                    logger.info("[%d/%d] %s no longer exists", index, len(targets), email)
+                else:
+                    logger.info("[%d/%d] %s: %s", index, len(targets), verb, email)
+                if self.cache and action == 'delete':
+                    self.cache.remove(email)
+                done += 1
+                self.metrics.add_account('rolled_back')
             
-            token_json = {
-                "token": token_info['access_token'],
-                "refresh_token": token_info.get('refresh_token'),
-                "token_uri": client_info['token_uri'],
-                "client_id": client_info['client_id'],
-                "client_secret": client_info['client_secret'],
-                "scopes": SCOPES,
-                "expiry": expiry.isoformat() + "Z"
-            }
+            self._execute_batch(requests, callback)
             
-            with open(TOKEN_FILE, 'w') as f:
-                json.dump(token_json, f, indent=2)
+            elapsed = time.time() - start_time
+            processed = min(start + size, len(targets))
+            rate = processed / elapsed if elapsed > 0 else 0
+            eta = (len(targets) - processed) / rate if rate > 0 else 0
+            print(f"Progress: {processed}/{len(targets)} ({processed / len(targets) * 100:.0f}%) "
+                  f"- {len(failed)} failed - ETA: {int(eta)}s")
+        
+        self.close()
+        
+        failed_file = None
+        if failed:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            failed_file = f"rollback_failed_{timestamp}.txt"
+            write_file_atomic(failed_file, "".join(f"{email} | - | -\n" for email in failed))
+            print(f"\nFailed accounts saved to: {failed_file} (pass it to --rollback to retry)")
+        
+        return {
+            'action': action,
+            'count': len(targets),
+            'successful': done,
+            'failed': len(failed),
+            'skipped': len(skipped),
+            'elapsed': time.time() - start_time,
+            'failed_file': failed_file,
+            'metrics': self.metrics.summary()
+        }
+    
+    def _list_for_verify(self, domain: str, wanted: Dict[str, Dict]) -> Tuple[Dict[str, Dict], Dict[str, Dict], int]:
+        """Page through a domain with a minimal field mask until every wanted address is seen"""
+        by_email, by_id = {}, {}
+        wanted_ids = {record['id'] for record in wanted.values() if record.get('id')}
+        pages = 0
+        page_token = None
+        while True:
+            response = self._execute(self.service.users().list(
+                domain=domain,
+                maxResults=LIST_PAGE_SIZE,
+                pageToken=page_token,
+                fields=f'nextPageToken,users({VERIFY_FIELDS})'
+            ))
+            pages += 1
+            for user in response.get('users', []):
+                email = user['primaryEmail'].lower()
+                if email in wanted:
+                    by_email[email] = user
+                if user.get('id') in wanted_ids:
+                    by_id[user['id']] = user
+            page_token = response.get('nextPageToken')
+            # Stop early once every listed account has been seen
+            if not page_token or len(by_email) == len(wanted):
+                break
+        return by_email, by_id, pages
+    
+    def _get_for_verify(self, emails: List[str]) -> Tuple[Dict[str, Dict], set, int]:
+        """Look up leftover addresses with batched gets; returns (found, missing, batches)"""
+        size = self.options.batch_size if self.options.batch_size > 1 else VERIFY_BATCH_SIZE
+        size = min(size, MAX_BATCH_SIZE)
+        found, missing = {}, set()
+        batches = 0
+        for start in range(0, len(emails), size):
+            chunk = emails[start:start + size]
+            requests = {str(i): self.service.users().get(userKey=email, fields=VERIFY_FIELDS)
+                        for i, email in enumerate(chunk)}
             
-            logger.info("Access token saved successfully")
-            return True
+            def callback(request_id, response, exception):
+                email = chunk[int(request_id)]
+                if exception is None:
+                    found[email] = response
+                elif _http_status(exception) == 404:
+                    missing.add(email)
+                else:
+                    logger.error("Could not verify %s: %s", email, exception)
             
-        except Exception as e:
-            logger.error("Failed to exchange code for token: %s", e)
-            return False
+            self._execute_batch(requests, callback)
+            batches += 1
+        return found, missing, batches
     
-    def authenticate(self) -> Optional[object]:
-        """Authenticate with Google Workspace"""
-        from google.oauth2.credentials import Credentials
-        from google.auth.transport.requests import Request
-        
-        creds = None
+    def verify_results(self, path: str) -> Optional[Dict]:
+        """Reconcile a results file with the directory and write a corrected copy"""
+        try:
+            records = read_result_records(path)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read %s: %s", path, e)
+            return None
+        if not records:
+            logger.error("No accounts found in %s", path)
+            return None
         
-        if os.path.exists(TOKEN_FILE):
+        print(f"\nVerifying {len(records)} accounts from {path}...")
+        print("-" * 60)
+        start_time = time.time()
+        by_domain = {}
+        for record in records:
+            by_domain.setdefault(record['email'].split('@', 1)[1].lower(), {})[record['email'].lower()] = record
+        
+        self._open_cache()
+        directory = {}
+        renamed = {}
+        list_pages = get_batches = 0
+        for domain, wanted in by_domain.items():
+            if self.cache and self.cache.count(domain) > LIST_PAGE_SIZE * len(wanted):
+                # Listing a domain this large costs more calls than one get per account
+                continue
             try:
-                creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+                by_email, by_id, pages = self._list_for_verify(domain, wanted)
             except Exception as e:
-                logger.error("Failed to load token: %s", e)
-        
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                try:
-                    creds.refresh(Request())
-                    with open(TOKEN_FILE, 'w') as token:
-                        token.write(creds.to_json())
-                    logger.info("Token refreshed successfully")
-                except Exception as e:
-                    logger.error("Token refresh failed: %s", e)
-                    if self.setup_oauth():
-                        return self.authenticate()
-                    return None
+                logger.warning("Failed to list %s, checking every account with batched gets: %s", domain, e)
+                by_email, by_id, pages = {}, {}, 0
+            list_pages += pages
+            directory.update(by_email)
+            for email, record in wanted.items():
+                if email not in by_email and record.get('id') in by_id:
+                    renamed[email] = by_id[record['id']]
+        
+        # Accounts created moments ago may not be listed yet, ask for them directly
+        leftovers = [email for domain in by_domain.values() for email in domain
+                     if email not in directory and email not in renamed]
+        missing = set()
+        if leftovers:
+            found, missing, get_batches = self._get_for_verify(leftovers)
+            directory.update(found)
+        
+        writer_format = self.options.format
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        corrected_path = f"verified_{timestamp}.{RESULT_FORMATS[writer_format]}"
+        writer = ResultsWriter(corrected_path, writer_format, ', '.join(by_domain))
+        counts = {'ok': 0, 'missing': 0, 'suspended': 0, 'mismatched': 0, 'unverified': 0}
+        
+        for record in records:
+            email = record['email']
+            user = directory.get(email.lower())
+            if email.lower() in renamed:
+                user = renamed[email.lower()]
+                counts['mismatched'] += 1
+                logger.warning("%s was renamed to %s", email, user['primaryEmail'],
+                               extra={'event': 'mismatched', 'email': email, 'user_id': user.get('id')})
+                record = dict(record, email=user['primaryEmail'])
+            elif user is None:
+                if email.lower() in missing:
+                    counts['missing'] += 1
+                    logger.warning("%s does not exist", email, extra={'event': 'missing', 'email': email})
+                    if self.cache:
+                        self.cache.remove(email)
+                else:
+                    counts['unverified'] += 1
+                continue
+            elif record.get('id') and record['id'] != user.get('id'):
+                counts['mismatched'] += 1
+                logger.warning("%s has id %s, the results file says %s", email, user.get('id'), record['id'],
+                               extra={'event': 'mismatched', 'email': email, 'user_id': user.get('id')})
+            elif user.get('suspended'):
+                counts['suspended'] += 1
+                logger.warning("%s is suspended", email, extra={'event': 'suspended', 'email': email})
             else:
-                logger.info("Authentication required")
-                if self.setup_oauth():
-                    return self.authenticate()
-                return None
+                counts['ok'] += 1
+            if user.get('suspended'):
+                # Only active accounts go to the corrected file
+                continue
+            writer.write(dict(record, id=user.get('id'), creation_time=user.get('creationTime')))
+        
+        writer.close()
+        self.close()
+        if not writer.count:
+            os.remove(writer.path)
+        
+        return dict(counts, count=len(records), list_pages=list_pages, get_batches=get_batches,
+                    leftovers=len(leftovers), elapsed=time.time() - start_time,
+                    corrected_file=writer.path if writer.count else None,
+                    metrics=self.metrics.summary())
+    
+    def _create_async(self, indices: Iterable[int], total: int) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Create accounts on an asyncio event loop with a bounded number of requests in flight"""
+        # Only --async needs the event loop, keep it out of the startup path
+        import asyncio
         
-        return creds
+        completed = queue.Queue()
+        
+        def runner():
+            try:
+                asyncio.run(self._async_run(indices, total, completed))
+            except Exception as e:
+                logger.error("Async engine stopped: %s", e)
+            finally:
+                completed.put(None)
+        
+        threading.Thread(target=runner, name='async-engine', daemon=True).start()
+        while True:
+            item = completed.get()
+            if item is None:
+                return
+            yield item
     
-    def generate_unique_email(self, first_name: str, last_name: str) -> str:
-        """Generate unique email address"""
-        base_email = f"{first_name.lower()}.{last_name.lower()}"
-        email = f"{base_email}@{self.domain}"
-        counter = 1
+    async def _async_run(self, indices: Iterable[int], total: int, completed: queue.Queue):
+        import asyncio
+        import aiohttp
+        from concurrent.futures import ThreadPoolExecutor
+        
+        limit = self.options.async_inflight
+        document = _discovery_document(self.options.api_endpoint)
+        methods = document['resources']['users']['methods']
+        base = document['rootUrl'] + document['servicePath']
+        urls = {'insert': base + methods['insert']['path'], 'get': base + methods['get']['path']}
+        
+        loop = asyncio.get_running_loop()
+        # Executor calls may probe addresses or read import rows through the API client,
+        # which is not thread-safe, so each executor thread gets its own connection
+        loop.set_default_executor(ThreadPoolExecutor(thread_name_prefix='async-io',
+                                                     initializer=self._connect_thread))
+        semaphore = asyncio.Semaphore(limit)
+        tasks = set()
+        
+        async def create(index: int):
+            try:
+                result = await self._async_create_user(session, urls, index, total)
+            except Exception as e:
+                logger.error("[%d/%d] Failed: %s", index, total, e)
+                result = None
+            finally:
+                semaphore.release()
+            completed.put((index, result))
+        
+        connector = aiohttp.TCPConnector(limit=limit)
+        timeout = aiohttp.ClientTimeout(total=self.options.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={'Accept-Encoding': 'gzip'}) as session:
+            work = iter(indices)
+            while True:
+                await semaphore.acquire()
+                # Streamed work may read files or probe the API, keep it off the loop
+                index = await loop.run_in_executor(None, next, work, None)
+                if index is None:
+                    semaphore.release()
+                    break
+                task = asyncio.create_task(create(index))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+    
+    async def _async_call(self, session, method: str, url: str, operation: str,
+                          body: Optional[Dict] = None) -> Tuple[Dict, float]:
+        """Send a REST call under rate control, retrying throttled calls; returns (response, latency)"""
+        import asyncio
+        from googleapiclient.errors import HttpError
+        
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        refreshed = False
+        while True:
+            wait = self.rate_controller.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.metrics.add_blocked('rate_limit', wait)
+            
+            headers = {}
+            self.credentials.apply(headers)
+            started = time.monotonic()
+            try:
+                async with session.request(method, url, json=body, headers=headers) as response:
+                    content = await response.read()
+                    status, reason, response_headers = response.status, response.reason, response.headers
+            except Exception:
+                self.metrics.observe(operation, time.monotonic() - started, 'error')
+                raise
+            latency = time.monotonic() - started
+            self.metrics.observe(operation, latency, status)
+            
+            if status < 300:
+                self.rate_controller.on_success()
+                self.metrics.set_gauge('rate_limit_calls_per_second', self.rate_controller.rate)
+                return (json.loads(content) if content else {}), latency
+            
+            error = HttpError(http_response(status, reason, response_headers), content, uri=url)
+            if status == 401 and not refreshed and self.credentials_manager:
+                # Token expired under us, refresh once and resend
+                refreshed = True
+                await loop.run_in_executor(None, self.credentials_manager.refresh)
+                continue
+            if not is_throttle_error(error) or attempt >= self.options.max_retries:
+                error.retried = attempt > 0
+                raise error
+            retry_after = retry_after_seconds(error)
+            self.rate_controller.on_throttle(retry_after)
+            delay = backoff_delay(attempt, retry_after)
+            logger.warning("Throttled (HTTP %s), retrying in %.1fs", status, delay)
+            await asyncio.sleep(delay)
+            self.metrics.add_blocked('backoff', delay)
+            attempt += 1
+    
+    async def _async_email_exists(self, session, urls: Dict[str, str], email: str) -> bool:
+        """Probe an address with users.get"""
+        url = urls['get'].replace('{userKey}', quote(email, safe='@'))
+        try:
+            await self._async_call(session, 'GET', url + '?fields=id', 'users.get')
+            return True
+        except Exception as e:
+            if _http_status(e) == 404:
+                return False
+            raise
+    
+    async def _async_plan(self, session, urls: Dict[str, str], index: int) -> Dict:
+        """Decide name and address for an account without blocking the loop"""
+        import asyncio
+        
+        spec = self.planned.pop(index, None)
+        if spec is None and (self.existing_emails is not None or self.options.optimistic):
+            # Resolved locally, no API calls involved
+            spec = self._new_spec(index)
+        while spec is None:
+            first_name, last_name, suffix = self.planner.next()
+            if suffix <= self.suffix_floor.get(base_address(first_name, last_name), -1):
+                continue
+            email = format_address(first_name, last_name, suffix, self.domain)
+            if not await self._async_email_exists(session, urls, email) and self._reserve_email(email):
+                spec = {'index': index, 'first_name': first_name, 'last_name': last_name, 'email': email}
+        # Journal writes may fsync, keep them off the loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._journal_plan, spec)
+    
+    async def _async_create_user(self, session, urls: Dict[str, str], index: int,
+                                 total: int) -> Optional[Dict]:
+        """Create a single user account with a direct users.insert call"""
+        import asyncio
+        
+        loop = asyncio.get_running_loop()
+        spec = await self._async_plan(session, urls, index)
+        conflicts = 0
         
         while True:
+            if self.journal:
+                # The plan must be durable before the account can exist
+                await loop.run_in_executor(None, self.journal.sync, spec['seq'])
+            
+            self._mark_first_insert()
             try:
-                self.service.users().get(userKey=email).execute()
-                # Email exists, try with number
-                email = f"{base_email}{counter}@{self.domain}"
-                counter += 1
-            except:
-                # Email doesn't exist, we can use it
-                break
+                if self.passwords and not spec.get('password'):
+                    # take() blocks while the hashing pool catches up, wait for it off the loop
+                    spec['password'], spec['password_hash'] = await loop.run_in_executor(None, self.passwords.take)
+                response, latency = await self._async_call(session, 'POST', urls['insert'], 'users.insert',
+                                                           self._build_user_body(spec))
+                # Outcomes touch the journal and the SQLite cache, both can block on disk
+                return await loop.run_in_executor(None, self._record_success, spec, total, response, latency)
+            except Exception as e:
+                # Resolving may look the account up, probe addresses and journal a new plan
+                action, value = await loop.run_in_executor(None, self._resolve_conflict, spec, e, conflicts)
+                if action == 'accept':
+                    return await loop.run_in_executor(None, self._record_success, spec, total, value)
+                if action == 'retry':
+                    spec = value
+                    conflicts += 1
+                    continue
+                await loop.run_in_executor(None, self._record_failure, spec, total, e)
+                return None
+    
+    def _engine(self, indices: Iterable[int], total: int) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Creation engine selected by the command-line options"""
+        if self.options.async_inflight:
+            return self._create_async(indices, total)
+        if self.options.workers > 1:
+            return self._create_concurrent(indices, total)
+        if self.options.batch_size > 1:
+            return self._create_batched(indices, total)
+        return self._create_sequential(indices, total)
+    
+    def enqueue_accounts(self, count: int) -> Optional[int]:
+        """Plan accounts against the directory index and add them to a work queue"""
+        print("Loading directory index...")
+        if not self.load_directory_index():
+            logger.error("Enqueueing needs a directory snapshot, users.list failed")
+            return None
         
-        return email
+        queue_file = WorkQueue(self.options.enqueue)
+        try:
+            # Index addresses already queued so they are not planned twice
+            for (spec_json,) in queue_file.conn.execute("SELECT spec FROM tasks"):
+                self._reserve_email(json.loads(spec_json)['email'])
+            indices = list(range(1, count + 1))
+            self.plan_accounts(indices)
+            # Queued addresses are final, a worker never moves one to another suffix
+            specs = ({k: v for k, v in self.planned.pop(i).items() if k != 'index'} for i in indices)
+            added = queue_file.enqueue(self.domain, (dict(spec, fixed=True) for spec in specs))
+            counts = queue_file.counts()
+        except (sqlite3.Error, ValueError) as e:
+            logger.error("Failed to enqueue accounts: %s", e)
+            return None
+        finally:
+            queue_file.close()
+            self.close()
+        
+        logger.info("Queued %d accounts in %s", added, self.options.enqueue)
+        print(f"\nQueued {added} accounts for {self.domain} in {self.options.enqueue} "
+              f"({counts['pending']} pending, {counts['done']} done)")
+        print(f"Start workers with: python bot.py --queue-worker {self.options.enqueue}")
+        return added
     
-    def create_user(self, index: int, total: int) -> Optional[str]:
-        """Create single user account"""
-        first_name = random.choice(self.first_names)
-        last_name = random.choice(self.last_names)
+    def run_queue_worker(self, path: str) -> Optional[Dict]:
+        """Claim, create and ack queued accounts until the queue is drained"""
+        work_queue = WorkQueue(path)
+        domain = work_queue.get_meta('domain')
+        if not domain:
+            logger.error("Queue %s is empty", path)
+            work_queue.close()
+            return None
+        self.domain = domain
+        owner = f"{platform.node()}-{os.getpid()}"
+        self.file_suffix = f"_{owner}"
+        self.progress_label = owner
+        total = sum(work_queue.counts().values())
+        claim_size = max(1, min(self.options.batch_size, MAX_BATCH_SIZE)) * max(
+            self.options.workers, self.options.async_inflight or 1)
+        
+        # Queued addresses were resolved by the coordinator, no directory index is needed
+        writer = self.open_results_writer()
+        self._start_stages()
+        progress = ProgressRenderer(0, label=owner)
+        progress.start()
+        success_count = failed_count = lost = 0
+        start_time = time.time()
         
-        email = self.generate_unique_email(first_name, last_name)
+        # A large claim can take longer than one lease at real quota, keep renewing while alive
+        stop_heartbeat = threading.Event()
         
-        user_data = {
-            "name": {
-                "givenName": first_name,
-                "familyName": last_name
-            },
-            "password": self.password,
-            "primaryEmail": email,
-            "changePasswordAtNextLogin": False
-        }
+        def heartbeat():
+            while not stop_heartbeat.wait(self.options.lease_seconds / 3):
+                try:
+                    work_queue.renew(owner, self.options.lease_seconds)
+                except sqlite3.Error as e:
+                    logger.warning("Failed to renew leases: %s", e)
+        
+        heartbeat_thread = threading.Thread(target=heartbeat, name='lease-heartbeat', daemon=True)
+        heartbeat_thread.start()
         
         try:
-            self.service.users().insert(body=user_data).execute()
-            logger.info("[%d/%d] Created: %s", index, total, email)
-            print(f"[{index}/{total}] ✓ {email}")
-            return f"{email} | {self.password} | {first_name} {last_name}"
-        except Exception as e:
-            error_msg = str(e)
-            if 'quotaExceeded' in error_msg:
-                logger.warning("[%d/%d] Quota exceeded", index, total)
-                print(f"[{index}/{total}] ⚠ Quota exceeded - please wait")
-            else:
-                logger.error("[%d/%d] Failed to create %s: %s", index, total, email, error_msg)
-                print(f"[{index}/{total}] ✗ {email} - Failed")
-            return None
+            while True:
+                claimed = work_queue.claim(owner, claim_size, self.options.lease_seconds)
+                if not claimed:
+                    counts = work_queue.counts()
+                    if counts['pending'] == 0 and counts['leased'] == 0:
+                        break
+                    # Other workers hold the rest; their leases may still expire
+                    time.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+                progress.total += len(claimed)
+                
+                indices = []
+                reclaimed = {}
+                for spec, attempts in claimed:
+                    index = spec['index']
+                    if attempts > 1:
+                        # A previous lease ran out, the insert may already have gone through
+                        try:
+                            response = self._find_own_account(spec)
+                        except Exception as e:
+                            # Inserting blind could duplicate the account
+                            logger.error("Could not check %s from an expired lease: %s", spec['email'], e)
+                            work_queue.ack(index, owner, error=f'could not check for an earlier insert: {e}')
+                            failed_count += 1
+                            progress.record(False)
+                            continue
+                        if response:
+                            logger.info("Verified account from an expired lease: %s", spec['email'])
+                            work_queue.ack(index, owner, user_id=response.get('id'))
+                            success_count += 1
+                            progress.record(True)
+                            continue
+                        reclaimed[index] = spec
+                    self.planned[index] = dict(spec)
+                    indices.append(index)
+                
+                for index, result in self._engine(indices, total):
+                    if result is None and index in reclaimed:
+                        # The previous holder may have inserted it while this worker did too (409)
+                        try:
+                            response = self._find_own_account(reclaimed[index])
+                        except Exception as e:
+                            logger.error("Could not check %s from an expired lease: %s", reclaimed[index]['email'], e)
+                            response = None
+                        if response:
+                            logger.info("Verified account from an expired lease: %s", reclaimed[index]['email'])
+                            work_queue.ack(index, owner, user_id=response.get('id'))
+                            success_count += 1
+                            progress.record(True)
+                            continue
+                    if result:
+                        writer.write(result)
+                        success_count += 1
+                        acked = work_queue.ack(index, owner, user_id=result.get('id'))
+                    else:
+                        failed_count += 1
+                        acked = work_queue.ack(index, owner, error='creation failed, see worker log')
+                    if not acked:
+                        lost += 1
+                        logger.warning("Lease on account %d expired before its outcome was recorded", index)
+                    progress.record(result is not None)
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+            progress.stop()
+            writer.close()
+            counts = work_queue.counts()
+            work_queue.close()
+        
+        members_added, members_failed = self.close()
+        
+        if writer.count:
+            print(f"\nResults saved to: {writer.path}")
+        else:
+            os.remove(writer.path)
+        if lost:
+            print(f"{lost} outcomes arrived after their lease expired, they will be verified by the next claim")
+        return {
+            'count': success_count + failed_count,
+            'successful': success_count,
+            'failed': failed_count,
+            'members_added': members_added,
+            'members_failed': members_failed,
+            'elapsed': time.time() - start_time,
+            'queue': counts
+        }
     
-    def save_results(self, results: List[str]) -> str:
-        """Save results to file"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"results_{timestamp}.txt"
+    def resume_from_journal(self, path: str) -> Optional[Tuple[int, List[int], List[Dict]]]:
+        """Replay a journal, re-verify in-flight accounts and return remaining work"""
+        try:
+            header, planned, outcomes = RunJournal.replay(path)
+        except (OSError, KeyError) as e:
+            logger.error("Failed to read journal %s: %s", path, e)
+            return None
+        
+        if not header:
+            logger.error("Journal %s has no run header", path)
+            return None
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("=" * 60 + "\n")
-            f.write("GOOGLE WORKSPACE BULK EMAIL CREATION RESULTS\n")
-            f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Domain: {self.domain}\n")
-            f.write("=" * 60 + "\n\n")
-            f.write("Email | Password | Full Name\n")
-            f.write("-" * 60 + "\n")
-            for result in results:
-                f.write(f"{result}\n")
+        if header.get('source'):
+            self.import_file = self.import_file or header['source']
+            if not self._restore_import_passwords(self.import_file, planned):
+                return None
+        # Import runs do not know their row count up front, resume after the last planned row
+        count = header['count'] or max(planned, default=0)
+        results = []
+        pending = []
+        
+        for index in range(1, count + 1):
+            spec = planned.get(index)
+            outcome = outcomes.get(index)
+            if outcome and outcome['status'] == 'created':
+                self._reserve_email(spec['email'])
+                results.append(self._result_record(spec, outcome))
+            elif spec and not outcome:
+                # Planned but no outcome recorded, the insert may have gone through
+                try:
+                    response = self._execute(self.service.users().get(userKey=spec['email']))
+                except Exception as e:
+                    if _http_status(e) != 404:
+                        # Unknown whether the insert went through, leave it for the next resume
+                        logger.error("Could not check in-flight account %s: %s", spec['email'], e)
+                        self._reserve_email(spec['email'])
+                        self.unresolved.append(index)
+                        continue
+                    if self._reserve_email(spec['email']):
+                        self.planned[index] = spec
+                    pending.append(index)
+                    continue
+                if created_since(response, spec.get('planned_at')):
+                    self._reserve_email(spec['email'])
+                    self._remember_email(spec['email'], response.get('id'))
+                    self.journal.record('created', index=index, email=spec['email'], id=response.get('id'))
+                    results.append(self._result_record(spec, response))
+                    logger.info("Verified in-flight account: %s", spec['email'])
+                elif spec.get('fixed'):
+                    # Given addresses are never renamed
+                    self._remember_email(spec['email'], response.get('id'))
+                    self.journal.record('failed', index=index, email=spec['email'],
+                                        error='address belongs to an account this run did not create')
+                    logger.warning("%s existed before it was planned, skipping row %d", spec['email'], index)
+                else:
+                    # The address was taken by someone else, not by this run's insert
+                    self.planned[index] = self._replan_conflict(spec)
+                    pending.append(index)
+            elif header.get('source'):
+                # Imported rows keep their names and addresses, unplanned rows were skipped
+                if spec:
+                    self._reserve_email(spec['email'])
+                    self.planned[index] = spec
+                    pending.append(index)
+            else:
+                pending.append(index)
         
-        return filename
+        logger.info("Resuming %s: %d already created, %d remaining, %d unresolved",
+                    path, len(results), len(pending), len(self.unresolved))
+        return count, pending, results
+    
+    def _restore_import_passwords(self, path: str, planned: Dict[int, Dict]) -> bool:
+        """Put roster passwords, which the journal leaves out, back into resumed import specs"""
+        try:
+            if 'password' not in import_columns(path):
+                return True
+            index = 0
+            for index, row in enumerate(read_import_rows(path), 1):
+                spec = planned.get(index)
+                if spec is None:
+                    continue
+                try:
+                    fields = normalize_import_row(row or {})
+                except ValueError:
+                    fields = {}
+                # Rows are matched by position, an edited file would hand out the wrong passwords
+                if (fields.get('first_name'), fields.get('last_name')) != (spec['first_name'], spec['last_name']):
+                    logger.error("Import row %d of %s no longer matches the journal, not resuming", index, path)
+                    return False
+                if 'password' in fields:
+                    spec['password'] = fields['password']
+            if max(planned, default=0) > index:
+                logger.error("%s has fewer rows than the journal planned, not resuming", path)
+                return False
+        except OSError as e:
+            logger.error("Cannot read %s for its roster passwords, not resuming: %s", path, e)
+            return False
+        return True
+    
+    def open_results_writer(self) -> ResultsWriter:
+        """Open the streamed results file in the selected format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"results_{timestamp}{self.file_suffix}.{RESULT_FORMATS[self.options.format]}"
+        return ResultsWriter(filename, self.options.format, self.domain)
     
     def run(self):
         """Main execution method"""
@@ -569,9 +3395,6 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
         if not self.check_dependencies():
             return
         
-        # Import Google libraries after dependency check
-        from googleapiclient.discovery import build
-        
         # Create default files
         self.create_default_files()
         
@@ -580,21 +3403,89 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             logger.error("Failed to load configuration")
             return
         
+        if self.options.random_passwords and not hash_function_available(self.options.hash_function or 'crypt'):
+            if self.options.hash_function:
+                # Asked for by name, do not quietly send a weaker hash
+                logger.error("%s hashing is not available on Python %s for %s, use --hash-function SHA-1",
+                             self.options.hash_function, platform.python_version(), platform.system())
+                return
+            logger.warning("crypt hashing is not available on Python %s for %s, using unsalted SHA-1 instead",
+                           platform.python_version(), platform.system())
+            self.options.hash_function = 'SHA-1'
+        self.options.hash_function = self.options.hash_function or 'crypt'
+        
+        if self.options.metrics_port:
+            start_metrics_server(self.metrics, self.options.metrics_port)
+            logger.info("Metrics available at http://127.0.0.1:%d/metrics", self.options.metrics_port)
+        
         # Display configuration
         print("Configuration:")
-        print(f"  Domain: {self.domain}")
-        print(f"  Password: {self.password}")
+        if len(self.domains) > 1:
+            print(f"  Domains: {', '.join(d if c is None else f'{d} ({c})' for d, c in self.domains)}")
+        else:
+            print(f"  Domain: {self.domain}")
+        if self.options.random_passwords:
+            print(f"  Password: random per user, sent as {self.options.hash_function} hash")
+        else:
+            print(f"  Password: {self.password}")
         print(f"  Name combinations: {len(self.first_names)} x {len(self.last_names)} = {len(self.first_names) * len(self.last_names)}")
+        if self.options.async_inflight:
+            print(f"  Async requests in flight: {self.options.async_inflight}")
+        elif self.options.workers > 1:
+            print(f"  Workers: {self.options.workers}")
+        if self.options.batch_size > 1:
+            print(f"  Batch size: {min(self.options.batch_size, MAX_BATCH_SIZE)}")
+        if self.import_file:
+            print(f"  Import: {self.import_file}")
+        if self.options.org_unit:
+            print(f"  Org unit: {self.options.org_unit}")
+        if self.options.groups:
+            print(f"  Groups: {', '.join(self.options.groups)}")
         print()
         
+        if self.options.rollback:
+            self.run_rollback()
+            return
+        
+        if self.options.verify:
+            self.run_verify()
+            return
+        
+        if self.options.queue_worker:
+            self.run_worker()
+            return
+        
+        if len(self.domains) > 1:
+            self.run_domains()
+            return
+        
         # Get number of accounts to create
-        try:
-            count = int(input("Number of accounts to create: "))
-            if count <= 0:
-                raise ValueError("Count must be positive")
-        except ValueError as e:
-            logger.error("Invalid input: %s", e)
+        count = None
+        if (self.options.plan or self.options.enqueue) and (self.import_file or self.options.resume):
+            logger.error("--plan and --enqueue work on generated names and cannot be combined with --import or --resume")
             return
+        if self.import_file:
+            if not os.path.exists(self.import_file):
+                logger.error("Import file not found: %s", self.import_file)
+                return
+        elif self.options.count is not None:
+            count = self.options.count
+            if count <= 0:
+                logger.error("Invalid input: Count must be positive")
+                return
+        elif self.domains[0][1] is not None and not self.options.resume:
+            count = self.domains[0][1]
+        elif not self.options.resume:
+            try:
+                count = int(input("Number of accounts to create: "))
+                if count <= 0:
+                    raise ValueError("Count must be positive")
+            except ValueError as e:
+                logger.error("Invalid input: %s", e)
+                return
+        
+        if self._groups_enabled():
+            self.scopes.append(GROUP_SCOPE)
         
         # Authenticate
         print("\nAuthenticating...")
@@ -603,61 +3494,525 @@ BELAKANG Pratama Sari Putra Dewi Santoso Lestari Wijaya Rahayu Setiawan Wati Kus
             logger.error("Authentication failed")
             return
         
-        # Build service
-        self.service = build('admin', 'directory_v1', credentials=creds)
+        self.connect(creds)
+        
+        if self.options.plan:
+            plan = self.plan_run(count)
+            if plan:
+                self.display_plan(plan)
+            return
+        
+        if self.options.enqueue:
+            self.enqueue_accounts(count)
+            return
+        
+        summary = self.create_accounts(count)
+        if summary:
+            self.display_summary(summary)
+    
+    def run_rollback(self):
+        """Confirm, authenticate and roll back the accounts of a previous run"""
+        path, action = self.options.rollback, self.options.rollback_action
+        if not os.path.exists(path):
+            logger.error("Rollback file not found: %s", path)
+            return
+        
+        if not self.options.yes:
+            answer = input(f"{action.capitalize()} every account listed in {path}? Type 'yes' to continue: ")
+            if answer.strip().lower() != 'yes':
+                print("Rollback cancelled")
+                return
+        
+        print("\nAuthenticating...")
+        creds = self.authenticate()
+        if not creds:
+            logger.error("Authentication failed")
+            return
+        
+        self.connect(creds)
+        summary = self.rollback_accounts(path, action)
+        if summary:
+            print("\n" + "=" * 60)
+            print("ROLLBACK SUMMARY")
+            print("=" * 60)
+            print(f"  {action.capitalize()}d: {summary['successful']}/{summary['count']}")
+            if summary['failed'] > 0:
+                print(f"  Failed: {summary['failed']}")
+            if summary['skipped'] > 0:
+                print(f"  Skipped, not created by this run: {summary['skipped']}")
+            print(f"  Duration: {int(summary['elapsed'])}s")
+            print("=" * 60)
+    
+    def run_verify(self):
+        """Authenticate and reconcile a results file with the directory"""
+        path = self.options.verify
+        if not os.path.exists(path):
+            logger.error("Results file not found: %s", path)
+            return
+        
+        print("\nAuthenticating...")
+        creds = self.authenticate()
+        if not creds:
+            logger.error("Authentication failed")
+            return
+        
+        self.connect(creds)
+        summary = self.verify_results(path)
+        if summary:
+            print("\n" + "=" * 60)
+            print("VERIFICATION SUMMARY")
+            print("=" * 60)
+            print(f"  Active: {summary['ok']}/{summary['count']}")
+            for key in ('missing', 'suspended', 'mismatched', 'unverified'):
+                if summary[key] > 0:
+                    print(f"  {key.capitalize()}: {summary[key]}")
+            print(f"  API requests: {summary['list_pages']} list pages, "
+                  f"{summary['get_batches']} get batches for {summary['leftovers']} leftovers")
+            print(f"  Duration: {int(summary['elapsed'])}s")
+            if summary['corrected_file']:
+                print(f"  Corrected results: {summary['corrected_file']}")
+            print("=" * 60)
+    
+    def run_worker(self):
+        """Authenticate and work through a queue filled by --enqueue"""
+        if not os.path.exists(self.options.queue_worker):
+            logger.error("Queue not found: %s", self.options.queue_worker)
+            return
+        
+        if self._groups_enabled():
+            self.scopes.append(GROUP_SCOPE)
+        
+        print("\nAuthenticating...")
+        creds = self.authenticate()
+        if not creds:
+            logger.error("Authentication failed")
+            return
+        
+        self.connect(creds)
+        summary = self.run_queue_worker(self.options.queue_worker)
+        if summary:
+            counts = summary['queue']
+            print("\n" + "=" * 60)
+            print("WORKER SUMMARY")
+            print("=" * 60)
+            print(f"  Created by this worker: {summary['successful']}")
+            if summary['failed'] > 0:
+                print(f"  Failed: {summary['failed']}")
+            if summary['members_added'] or summary['members_failed']:
+                print(f"  Group memberships: {summary['members_added']} added, {summary['members_failed']} failed")
+            print(f"  Duration: {int(summary['elapsed'])}s")
+            print(f"  Queue: {counts['done']} done, {counts['failed']} failed, "
+                  f"{counts['pending'] + counts['leased']} remaining")
+            print("=" * 60)
+    
+    def run_domains(self):
+        """Create accounts in every configured domain in parallel under one session"""
+        if self.import_file or self.options.resume or self.options.plan or self.options.enqueue:
+            logger.error("--import, --resume, --plan and --enqueue work on a single domain, "
+                         "list one domain in %s", DOMAIN_FILE)
+            return
+        
+        targets = []
+        default_count = self.options.count
+        for domain, count in self.domains:
+            if count is None and default_count is None:
+                try:
+                    default_count = int(input("Number of accounts per domain: "))
+                    if default_count <= 0:
+                        raise ValueError("Count must be positive")
+                except ValueError as e:
+                    logger.error("Invalid input: %s", e)
+                    return
+            targets.append((domain, count if count is not None else default_count))
+        
+        if self._groups_enabled():
+            self.scopes.append(GROUP_SCOPE)
+        
+        print("\nAuthenticating...")
+        creds = self.authenticate()
+        if not creds:
+            logger.error("Authentication failed")
+            return
+        
+        self.connect(creds)
+        summary = self.create_accounts_in_domains(targets)
+        self.display_domain_summary(summary)
+    
+    def _domain_manager(self, domain: str) -> 'GoogleWorkspaceManager':
+        """Manager for one domain that shares this session's credentials, quota and metrics"""
+        options = argparse.Namespace(**vars(self.options))
+        options.metrics_summary = None
+        manager = GoogleWorkspaceManager(options)
+        manager.domain = domain
+        manager.password = self.password
+        manager.first_names, manager.last_names = self.first_names, self.last_names
+        manager.planner = NamePlanner(self.first_names, self.last_names)
+        manager.scopes = self.scopes
+        manager.file_suffix = f"_{domain}"
+        manager.progress_label = domain
+        # One project quota: every domain draws from the same adaptive rate limit
+        manager.rate_controller = self.rate_controller
+        manager.metrics = self.metrics
+        # One SQLite connection, separate writers would block on each other's open transactions
+        manager.cache = self.cache
+        manager.cache_shared = True
+        manager.credentials = self.credentials
+        manager.service = manager._build_service()
+        return manager
+    
+    def create_accounts_in_domains(self, targets: List[Tuple[str, int]]) -> Dict:
+        """Run each domain's creation concurrently and return a combined summary
+        
+        Domains run with the same engine settings against the shared rate
+        limit, so each gets an equal share of the quota while all are busy
+        and the remaining domains absorb it as others finish.
+        """
+        start_time = time.time()
+        summaries = {}
+        if self.options.prefetch:
+            self._open_cache()
+        
+        def run_domain(manager: 'GoogleWorkspaceManager', count: int):
+            try:
+                summaries[manager.domain] = manager.create_accounts(count)
+            except Exception as e:
+                logger.error("Run for %s failed: %s", manager.domain, e)
+                summaries[manager.domain] = None
+        
+        threads = []
+        for domain, count in targets:
+            print(f"{domain}: {count} accounts")
+            thread = threading.Thread(target=run_domain, args=(self._domain_manager(domain), count),
+                                      name=f"domain-{domain}")
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        
+        self.close()
+        
+        domains = {domain: summaries.get(domain) for domain, _ in targets}
+        completed = [s for s in domains.values() if s]
+        summary = {
+            'domains': domains,
+            'count': sum(count for _, count in targets),
+            'successful': sum(s['successful'] for s in completed),
+            'failed': sum(s['failed'] for s in completed),
+            'elapsed': time.time() - start_time,
+            'metrics': self.metrics.summary()
+        }
+        
+        if self.options.metrics_summary:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = self.options.metrics_summary.replace('{timestamp}', timestamp)
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Metrics saved to: {path}")
+        
+        return summary
+    
+    def _instrument_refresh(self, creds):
+        """Time token refreshes triggered by the HTTP transport"""
+        refresh = creds.refresh
+        
+        def timed_refresh(request):
+            # Refreshes on the background thread do not hold up any call
+            busy = threading.current_thread().name != 'token-refresh'
+            started = time.monotonic()
+            try:
+                refresh(request)
+            except Exception as e:
+                self.metrics.observe('token_refresh', time.monotonic() - started,
+                                     _http_status(e) or 'error', busy=busy)
+                raise
+            self.metrics.observe('token_refresh', time.monotonic() - started, 200, busy=busy)
+        
+        creds.refresh = timed_refresh
+    
+    def connect(self, creds):
+        """Build the Directory API service for authenticated credentials"""
+        self._instrument_refresh(creds)
+        self.credentials = creds
+        self.credentials_manager = CredentialsManager(creds)
+        self.credentials_manager.start()
+        self.service = self._build_service()
         logger.info("Connected to Google Workspace Admin SDK")
+    
+    def create_accounts(self, count: Optional[int]) -> Optional[Dict]:
+        """Create accounts (or resume a journaled run) and return a summary"""
+        # Open the run journal, replaying it first when resuming
+        if self.options.resume:
+            # The journal decides the domain, settle it before the index is loaded
+            try:
+                header = RunJournal.read_header(self.options.resume)
+            except OSError as e:
+                logger.error("Failed to read journal %s: %s", self.options.resume, e)
+                return None
+            if not header:
+                logger.error("Journal %s has no run header", self.options.resume)
+                return None
+            if header['domain'] != self.domain:
+                logger.warning("Journal domain %s differs from %s, resuming on %s",
+                               header['domain'], self.domain, header['domain'])
+                self.domain = header['domain']
+            self.journal = RunJournal(self.options.resume)
+        elif self.options.journal:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = self.options.journal.replace('{timestamp}', timestamp)
+            self.journal = RunJournal(domain_path(path, self.domain) if self.file_suffix else path)
+            self.journal.record('run', domain=self.domain, count=count, source=self.import_file)
+            self.journal.sync()
+            print(f"Journal: {self.journal.path}")
+        
+        # Prefetch existing addresses so uniqueness checks stay local
+        if self.options.prefetch:
+            print("Loading directory index...")
+            self.load_directory_index()
+        
+        if self.options.resume:
+            resumed = self.resume_from_journal(self.options.resume)
+            if resumed is None:
+                return None
+            count, pending, resumed_results = resumed
+            print(f"Resuming: {len(resumed_results)}/{count} already created")
+            if self.unresolved:
+                print(f"{len(self.unresolved)} in-flight accounts could not be checked and are left out, "
+                      f"resume again to retry them")
+        elif self.import_file:
+            count, pending, resumed_results = 0, [], []
+        else:
+            pending = list(range(1, count + 1))
+            resumed_results = []
+        expected = len(pending)
+        work = pending
+        
+        if self.import_file:
+            # Rows are validated and handed to the engine as they are read
+            total = count_import_rows(self.import_file)
+            expected += max(total - count, 0)
+            work = chain(pending, self.stream_import(self.import_file, skip=count))
+            count = max(total, count)
+        
+        # Stream results to disk as accounts complete
+        writer = self.open_results_writer()
+        for record in resumed_results:
+            writer.write(record)
+        
+        # With a local index the whole plan costs no API calls
+        if self.existing_emails is not None:
+            self.plan_accounts(pending)
+        
+        self._start_stages()
         
         # Create accounts
-        print(f"\nCreating {count} accounts...")
+        print(f"\nCreating {expected} accounts...")
         print("-" * 60)
         
-        results = []
-        success_count = 0
+        resumed_count = len(resumed_results)
+        success_count = resumed_count
         failed_count = 0
         start_time = time.time()
         
-        for i in range(1, count + 1):
-            result = self.create_user(i, count)
-            
-            if result:
-                results.append(result)
-                success_count += 1
-            else:
-                failed_count += 1
-            
-            # Progress indicator
-            if i % 10 == 0:
-                elapsed = time.time() - start_time
-                rate = i / elapsed
-                eta = (count - i) / rate if rate > 0 else 0
-                print(f"\nProgress: {i}/{count} ({(i/count)*100:.0f}%) - ETA: {int(eta)}s\n")
-            
-            # Rate limiting
-            time.sleep(RATE_LIMIT_DELAY)
+        engine = self._engine(work, count)
+        progress = ProgressRenderer(expected, label=self.progress_label)
+        progress.start()
+        try:
+            for _, result in engine:
+                if result:
+                    writer.write(result)
+                    success_count += 1
+                else:
+                    failed_count += 1
+                progress.record(result is not None)
+                # Import rows rejected by validation never reach the engine
+                progress.total = expected - self.skipped
+        finally:
+            progress.stop()
+        
+        members_added, members_failed = self.close()
+        
+        # Close results
+        writer.close()
+        if writer.count:
+            print(f"\nResults saved to: {writer.path}")
+        else:
+            os.remove(writer.path)
+        
+        if self.import_file:
+            count = success_count + failed_count
+        
+        summary = {
+            'count': count,
+            'successful': success_count,
+            'failed': failed_count,
+            'skipped': self.skipped,
+            'unresolved': len(self.unresolved),
+            'members_added': members_added,
+            'members_failed': members_failed,
+            'resumed': resumed_count,
+            'elapsed': time.time() - start_time,
+            'first_insert_after': self.first_insert_after,
+            'results_file': writer.path if writer.count else None,
+            'metrics': self.metrics.summary()
+        }
         
-        # Save results
-        if results:
-            filename = self.save_results(results)
-            print(f"\nResults saved to: {filename}")
+        if self.options.metrics_summary:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            path = self.options.metrics_summary.replace('{timestamp}', timestamp)
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Metrics saved to: {path}")
         
-        # Display summary
-        elapsed_total = time.time() - start_time
+        return summary
+    
+    def display_summary(self, summary: Dict):
+        """Display run summary"""
+        elapsed_total = summary['elapsed']
+        created_now = summary['successful'] - summary['resumed']
         print("\n" + "=" * 60)
         print("SUMMARY")
         print("=" * 60)
-        print(f"  Successful: {success_count}/{count}")
-        if failed_count > 0:
-            print(f"  Failed: {failed_count}")
+        print(f"  Successful: {summary['successful']}/{summary['count']}")
+        if summary['failed'] > 0:
+            print(f"  Failed: {summary['failed']}")
+        if summary['skipped'] > 0:
+            print(f"  Skipped rows: {summary['skipped']}")
+        if summary['unresolved'] > 0:
+            print(f"  Unresolved, resume again: {summary['unresolved']}")
+        if summary['members_added'] or summary['members_failed']:
+            print(f"  Group memberships: {summary['members_added']} added, {summary['members_failed']} failed")
         print(f"  Duration: {int(elapsed_total)}s")
-        if success_count > 0:
-            print(f"  Rate: {success_count/elapsed_total:.2f} accounts/second")
+        if self.first_insert_after is not None:
+            print(f"  Startup: {self.first_insert_after:.2f}s to first insert")
+        if created_now > 0:
+            print(f"  Rate: {created_now/elapsed_total:.2f} accounts/second")
+        
+        metrics = summary['metrics']
+        blocked = metrics['blocked_seconds']
+        if metrics['operations']:
+            calls = ', '.join(f"{op} {info['count']}" for op, info in sorted(metrics['operations'].items()))
+            print(f"  API calls: {calls}")
+            print(f"  API time: {metrics['busy_seconds']:.1f}s in calls, "
+                  f"{blocked.get('rate_limit', 0):.1f}s rate limited, {blocked.get('backoff', 0):.1f}s backing off")
+        print("=" * 60)
+    
+    def display_domain_summary(self, summary: Dict):
+        """Display the summary of a multi-domain run"""
+        print("\n" + "=" * 60)
+        print("SUMMARY")
+        print("=" * 60)
+        for domain, result in summary['domains'].items():
+            if result is None:
+                print(f"  {domain}: did not complete")
+                continue
+            line = f"  {domain}: {result['successful']}/{result['count']} in {int(result['elapsed'])}s"
+            if result['failed'] > 0:
+                line += f", {result['failed']} failed"
+            if result['results_file']:
+                line += f" -> {result['results_file']}"
+            print(line)
+        print(f"  Total: {summary['successful']}/{summary['count']} in {int(summary['elapsed'])}s")
+        if summary['successful'] > 0:
+            print(f"  Rate: {summary['successful'] / summary['elapsed']:.2f} accounts/second")
+        
+        metrics = summary['metrics']
+        blocked = metrics['blocked_seconds']
+        if metrics['operations']:
+            calls = ', '.join(f"{op} {info['count']}" for op, info in sorted(metrics['operations'].items()))
+            print(f"  API calls: {calls}")
+            print(f"  API time: {metrics['busy_seconds']:.1f}s in calls, "
+                  f"{blocked.get('rate_limit', 0):.1f}s rate limited, {blocked.get('backoff', 0):.1f}s backing off")
         print("=" * 60)
 
 
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Google Workspace Bulk Email Creator")
+    parser.add_argument('--count', type=int, metavar='N',
+                        help="Number of accounts to create (skips the prompt)")
+    parser.add_argument('--import', dest='import_file', metavar='FILE',
+                        help="Create the accounts listed in a CSV or JSONL file instead of generated names")
+    parser.add_argument('--plan', nargs='?', const=PLAN_FILE, metavar='FILE',
+                        help=f"Dry run: resolve every address and write a plan, creating nothing (default file: {PLAN_FILE})")
+    parser.add_argument('--enqueue', metavar='QUEUE',
+                        help="Coordinator: plan the accounts and add them to an SQLite work queue instead of creating them")
+    parser.add_argument('--queue-worker', metavar='QUEUE',
+                        help="Worker: claim accounts from a work queue, create them and record the outcome")
+    parser.add_argument('--lease-seconds', type=float, default=LEASE_SECONDS, metavar='SECONDS',
+                        help=f"How long a worker holds claimed accounts before they return to the queue (default: {LEASE_SECONDS:g})")
+    parser.add_argument('--verify', metavar='FILE',
+                        help="Check that every account in a results file exists and is active, and write a corrected results file")
+    parser.add_argument('--rollback', metavar='FILE',
+                        help="Undo a previous run: act on every account in its results file or journal")
+    parser.add_argument('--rollback-action', choices=['suspend', 'delete'], default='suspend',
+                        help="What --rollback does to each account (default: suspend)")
+    parser.add_argument('--yes', action='store_true',
+                        help="Do not ask for confirmation before a rollback")
+    parser.add_argument('--random-passwords', action='store_true',
+                        help="Give every account its own random password, sent pre-hashed (plaintext only in the results file)")
+    parser.add_argument('--password-length', type=int, default=PASSWORD_LENGTH, metavar='N',
+                        help=f"Length of random passwords (default: {PASSWORD_LENGTH})")
+    parser.add_argument('--hash-function', choices=HASH_FUNCTIONS,
+                        help="Hash sent with random passwords: salted SHA-512 crypt or SHA-1 "
+                             "(default: crypt, or SHA-1 where crypt is not available)")
+    parser.add_argument('--org-unit', metavar='PATH',
+                        help="Organizational unit for new accounts, e.g. /Sales (default: the root unit)")
+    parser.add_argument('--group', dest='groups', action='append', metavar='EMAIL',
+                        help="Add every created account to this group; repeat for several groups")
+    parser.add_argument('--batch-size', type=int, default=1, metavar='N',
+                        help=f"Group N inserts per batch HTTP request (max {MAX_BATCH_SIZE}, default: 1)")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="Create accounts with N concurrent workers, each on its own connection (default: 1)")
+    parser.add_argument('--async', dest='async_inflight', type=int, metavar='N',
+                        help="Create accounts on an asyncio engine (needs aiohttp) with up to N requests in flight")
+    parser.add_argument('--transport', choices=['httplib2', 'requests'], default='httplib2',
+                        help="HTTP transport: one httplib2 connection per worker, or a shared "
+                             "keep-alive connection pool (default: httplib2)")
+    parser.add_argument('--pool-size', type=int, metavar='N',
+                        help="Connections in the requests pool (default: max(workers, 10))")
+    parser.add_argument('--timeout', type=float, default=HTTP_TIMEOUT, metavar='SECONDS',
+                        help=f"Timeout for each API request (default: {HTTP_TIMEOUT})")
+    parser.add_argument('--rate', type=float, default=1 / RATE_LIMIT_DELAY, metavar='N',
+                        help=f"Initial API calls per second, adapted to quota responses (default: {1 / RATE_LIMIT_DELAY:g})")
+    parser.add_argument('--max-rate', type=float, default=MAX_API_RATE, metavar='N',
+                        help=f"Upper bound for API calls per second (default: {MAX_API_RATE:g})")
+    parser.add_argument('--max-retries', type=int, default=MAX_RETRIES, metavar='N',
+                        help=f"Retries for throttled calls before giving up (default: {MAX_RETRIES})")
+    parser.add_argument('--format', choices=sorted(RESULT_FORMATS), default='text',
+                        help="Results file format (default: text)")
+    parser.add_argument('--journal', default=JOURNAL_FILE, metavar='FILE',
+                        help=f"Run journal for crash recovery (default: {JOURNAL_FILE})")
+    parser.add_argument('--no-journal', dest='journal', action='store_const', const=None,
+                        help="Do not write a run journal")
+    parser.add_argument('--resume', metavar='JOURNAL',
+                        help="Resume an interrupted run from its journal")
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text',
+                        help="Log line format; json writes one structured event per line (default: text)")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--metrics-summary', metavar='FILE',
+                        help="Write a JSON summary with per-operation metrics at the end of the run")
+    parser.add_argument('--optimistic', action='store_true',
+                        help="Insert without probing and move to the next suffix on 409 conflicts")
+    parser.add_argument('--no-prefetch', dest='prefetch', action='store_false',
+                        help="Probe each candidate address with users.get instead of listing the directory once")
+    parser.add_argument('--cache-file', default=CACHE_FILE, metavar='FILE',
+                        help=f"SQLite directory cache (default: {CACHE_FILE})")
+    parser.add_argument('--no-cache', dest='cache_file', action='store_const', const=None,
+                        help="Do not use the on-disk directory cache")
+    parser.add_argument('--cache-max-age', type=float, default=CACHE_MAX_AGE, metavar='HOURS',
+                        help=f"Re-sync the directory cache after HOURS (default: {CACHE_MAX_AGE})")
+    parser.add_argument('--api-endpoint', metavar='URL',
+                        help="Directory API root URL, e.g. a local test server (default: Google)")
+    return parser.parse_args(argv)
+
+
 def main():
     """Main entry point"""
+    options = parse_args()
+    listener = configure_logging(options.log_format == 'json')
     try:
-        manager = GoogleWorkspaceManager()
+        manager = GoogleWorkspaceManager(options)
         manager.run()
     except KeyboardInterrupt:
         print("\n\nOperation cancelled by user")
@@ -665,6 +4020,8 @@ def main():
     except Exception as e:
         logger.error("Unexpected error: %s", e)
         print(f"\nError: {e}")
+    finally:
+        listener.stop()
 
 
 if __name__ == '__main__':
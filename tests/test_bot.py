@@ -0,0 +1,147 @@
+"""Resume and import tests against the fake Directory API from benchmark.py"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import bot
+from google.oauth2.credentials import Credentials
+
+
+class RecordingDirectory(benchmark.FakeDirectory):
+    """Fake directory that keeps insert passwords and can refuse lookups of some addresses"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.passwords = {}
+        self.forbidden = set()
+
+    def _dispatch(self, name, method, path, query, body):
+        if name == 'users.get' and any(email in path for email in self.forbidden):
+            return 403, benchmark._error(403, "Forbidden", 'forbidden'), {}
+        if name == 'users.insert':
+            user = json.loads(body or b'{}')
+            self.passwords[user.get('primaryEmail')] = user.get('password')
+        return super()._dispatch(name, method, path, query, body)
+
+
+class ResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        self.directory = RecordingDirectory(latency=0.001, seed=1)
+        self.server, self.url = benchmark.start_server(self.directory)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def write_journal(self, path, domain, events, count=None, source=None):
+        planned_at = time.time() - 10
+        lines = [dict(event='run', domain=domain, count=count, source=source, ts=planned_at)]
+        lines += [dict(event, ts=planned_at) for event in events]
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(line) + "\n" for line in lines)
+
+    def run_bot(self, *argv, domain='v.test', count=None):
+        manager = bot.GoogleWorkspaceManager(bot.parse_args([
+            '--api-endpoint', self.url, '--no-cache', '--format', 'jsonl',
+            '--rate', '400', '--max-rate', '1000', *argv]))
+        manager.load_configuration()
+        manager.domain = domain
+        manager.connect(Credentials(token='x'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = manager.create_accounts(count)
+        return manager, summary
+
+    def people(self):
+        return [(u['name']['givenName'], u['name']['familyName']) for u in self.directory.users.values()]
+
+    def test_resume_after_failed_check_does_not_duplicate(self):
+        self.write_journal('journal.jsonl', 'v.test', [
+            dict(event='planned', index=1, first_name='Budi', last_name='Santoso', email='budi.santoso@v.test'),
+            dict(event='planned', index=2, first_name='Citra', last_name='Dewi', email='citra.dewi@v.test'),
+        ], count=2)
+        # The in-flight insert went through, but checking it fails
+        self.directory.add_user('budi.santoso@v.test', 'Budi', 'Santoso')
+        self.directory.forbidden.add('budi.santoso')
+
+        _, summary = self.run_bot('--resume', 'journal.jsonl')
+        self.assertEqual(summary['unresolved'], 1)
+        self.assertEqual(summary['successful'], 1)
+        self.assertNotIn('budi.santoso1@v.test', self.directory.users)
+
+        # Once the check works, the account is adopted rather than created again
+        self.directory.forbidden.clear()
+        _, summary = self.run_bot('--resume', 'journal.jsonl')
+        self.assertEqual(summary['unresolved'], 0)
+        self.assertEqual(summary['successful'], 2)
+        self.assertEqual(sorted(self.people()), [('Budi', 'Santoso'), ('Citra', 'Dewi')])
+
+    def test_resume_restores_roster_passwords(self):
+        with open('roster.csv', 'w') as f:
+            f.write("first_name,last_name,password\nAna,Ruiz,pw-ana-1\nBo,Li,pw-bo-2\nCy,Ng,pw-cy-3\n")
+        self.write_journal('journal.jsonl', 'v.test', [
+            dict(event='planned', index=1, first_name='Ana', last_name='Ruiz', email='ana.ruiz@v.test'),
+            dict(event='created', index=1, email='ana.ruiz@v.test', id='1'),
+            dict(event='planned', index=2, first_name='Bo', last_name='Li', email='bo.li@v.test'),
+        ], source='roster.csv')
+
+        _, summary = self.run_bot('--resume', 'journal.jsonl')
+        self.assertEqual(summary['successful'], 3)
+        self.assertEqual(self.directory.passwords, {'bo.li@v.test': 'pw-bo-2', 'cy.ng@v.test': 'pw-cy-3'})
+        with open(summary['results_file']) as f:
+            passwords = {record['email']: record['password'] for record in map(json.loads, f)}
+        self.assertEqual(passwords['ana.ruiz@v.test'], 'pw-ana-1')
+
+    def test_resume_refuses_edited_roster(self):
+        with open('roster.csv', 'w') as f:
+            f.write("first_name,last_name,password\nAna,Ruiz,pw-ana-1\nXo,Li,pw-bo-2\n")
+        self.write_journal('journal.jsonl', 'v.test', [
+            dict(event='planned', index=1, first_name='Ana', last_name='Ruiz', email='ana.ruiz@v.test'),
+            dict(event='planned', index=2, first_name='Bo', last_name='Li', email='bo.li@v.test'),
+        ], source='roster.csv')
+
+        _, summary = self.run_bot('--resume', 'journal.jsonl')
+        self.assertIsNone(summary)
+        self.assertEqual(self.directory.users, {})
+
+    def test_import_skips_rows_with_non_text_values(self):
+        rows = [{"first_name": 2024, "last_name": "Kim"},
+                {"first_name": {"x": 1}, "last_name": "Lee"},
+                {"first_name": "Ana", "last_name": "Ruiz", "groups": ["team@v.test"]}]
+        with open('roster.jsonl', 'w') as f:
+            f.writelines(json.dumps(row) + "\n" for row in rows)
+
+        _, summary = self.run_bot('--import', 'roster.jsonl')
+        self.assertEqual(summary['successful'], 2)
+        self.assertEqual(summary['skipped'], 1)
+        self.assertEqual(sorted(self.directory.users), ['2024.kim@v.test', 'ana.ruiz@v.test'])
+
+    def test_resume_indexes_the_journal_domain(self):
+        self.directory.add_user('citra.dewi@v.test', 'Citra', 'Dewi')
+        self.write_journal('journal.jsonl', 'v.test', [
+            dict(event='planned', index=1, first_name='Citra', last_name='Dewi', email='citra.dewi1@v.test'),
+        ], count=1)
+
+        manager, summary = self.run_bot('--resume', 'journal.jsonl', domain='other.test')
+        self.assertEqual(manager.domain, 'v.test')
+        self.assertIn('citra.dewi@v.test', manager.existing_emails)
+        self.assertEqual(summary['successful'], 1)
+        self.assertIn('citra.dewi1@v.test', self.directory.users)
+
+
+if __name__ == '__main__':
+    unittest.main()